@@ -0,0 +1,102 @@
+import numpy as np
+import sounddevice as sd
+
+from audio_utils import DEFAULT_BLOCK_SIZE
+from instrumentation import timed
+
+
+class BufferSource:
+    """Block source that plays back an already rendered buffer once."""
+
+    def __init__(self, data):
+        data = np.asarray(data)
+        if np.issubdtype(data.dtype, np.integer):
+            # int16 buffers (e.g. after 8-bit conversion) are scaled back to [-1, 1]
+            data = data / 32768.0
+        self.data = np.asarray(data, dtype=np.float32)  # No copy for float32 renders
+        self.position = 0
+
+    @property
+    def finished(self):
+        return self.position >= len(self.data)
+
+    def process(self, frames):
+        block = np.zeros(frames, dtype=np.float32)
+        chunk = self.data[self.position:self.position + frames]
+        block[:len(chunk)] = chunk
+        self.position += frames
+        return block
+
+
+class MixSource:
+    """Block source that sums several sources, dropping each one once it has finished.
+
+    Lets a source that is fading out (e.g. a stopped LiveVoice) finish its
+    fade under the next one instead of being cut off with a click.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+
+    @property
+    def finished(self):
+        return not self.sources
+
+    def process(self, frames):
+        block = np.zeros(frames, dtype=np.float32)
+        for source in self.sources:
+            block += source.process(frames)
+        self.sources = [source for source in self.sources if not getattr(source, "finished", False)]
+        return block
+
+
+class AudioEngine:
+    """Streams blocks from a source object through a sounddevice OutputStream.
+
+    A source is anything with a `process(frames)` method that returns a block
+    of samples, e.g. an oscillator from audio_utils or a BufferSource.
+    """
+
+    def __init__(self, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.source = None
+        self.underruns = 0  # Blocks the device ran out of data for
+        self.stream = sd.OutputStream(
+            samplerate=sample_rate,
+            blocksize=block_size,
+            channels=1,
+            dtype="float32",
+            latency="low",
+            callback=self._callback,
+        )
+
+    @timed("audio callback")
+    def _callback(self, outdata, frames, time, status):
+        if status.output_underflow:
+            self.underruns += 1
+        source = self.source  # Read once so a swap from the GUI thread is safe
+        if source is None:
+            outdata.fill(0)
+            return
+        outdata[:, 0] = source.process(frames)
+        if getattr(source, "finished", False) and self.source is source:
+            self.source = None
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+
+    def close(self):
+        self.stream.close()
+
+    def play(self, source):
+        """Start playing a block source, replacing whatever was playing."""
+        self.source = source
+
+    def play_buffer(self, data, fading=None):
+        """Play a rendered buffer through the stream, mixed with `fading` (a stopped source) until it has faded out."""
+        source = BufferSource(data)
+        self.play(source if fading is None else MixSource([fading, source]))
@@ -1,50 +1,454 @@
+from functools import lru_cache
+
 import numpy as np
-from scipy.signal import butter, lfilter
+
+from instrumentation import returned_duration, timed
+from wavetables import WAVETABLE_SHAPES, build_mipmap, octave_for, table_lookup
+
+DEFAULT_BLOCK_SIZE = 512
+DEFAULT_DTYPE = np.float32  # Wide enough for playback and export, half the memory traffic of float64
+
+
+# ===== WAVE SHAPES =====
+# Map a phase in cycles to a sample in [-1, 1]; work on arrays of any shape
+def sine_shape(phase):
+    return np.sin(2 * np.pi * phase)
+
+def square_shape(phase, duty_cycle=0.5):
+    return np.sign(np.sin(2 * np.pi * phase) + (2 * duty_cycle - 1))
+
+def sawtooth_shape(phase):
+    return 2 * (phase - np.floor(phase)) - 1  # Sawtooth formula
+
+WAVE_SHAPES = {"sine": sine_shape, "square": square_shape, "sawtooth": sawtooth_shape}
+
+
+def accumulate_phase(phase, increment):
+    """Integrate per-sample phase increments (in cycles) starting from `phase`.
+
+    Returns the phase of every sample and the wrapped phase after the block,
+    so a changing frequency never makes the waveform jump.
+    """
+    phases = np.cumsum(increment)
+    if len(phases) == 0:
+        return phases, phase
+    end = float(phases[-1] + phase) % 1.0
+    phases -= increment  # Each sample only sees the increments before it
+    phases += phase
+    return phases, end
+
+
+# ===== STREAMING OSCILLATORS =====
+class Oscillator:
+    """Phase-continuous oscillator that renders fixed-size blocks on demand."""
+
+    def __init__(self, frequency, amplitude, sample_rate=44100, dtype=DEFAULT_DTYPE):
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.phase = 0.0  # Phase in cycles, kept in [0, 1) as a Python float
+
+    def reset(self):
+        self.phase = 0.0
+
+    def process(self, frames):
+        """Render the next `frames` samples and advance the phase."""
+        increment = self.frequency / self.sample_rate
+        # Phase within the block stays small, so it is accurate enough in float32
+        phase = self.phase + increment * np.arange(frames, dtype=self.dtype)
+        self.phase = (self.phase + increment * frames) % 1.0
+        return self.amplitude * self._shape(phase)
+
+    def _shape(self, phase):
+        raise NotImplementedError
+
+
+class SineOscillator(Oscillator):
+    def _shape(self, phase):
+        return sine_shape(phase)
+
+
+class SquareOscillator(Oscillator):
+    def __init__(self, frequency, amplitude, duty_cycle=0.5, sample_rate=44100, dtype=DEFAULT_DTYPE):
+        super().__init__(frequency, amplitude, sample_rate, dtype)
+        self.duty_cycle = duty_cycle
+
+    def _shape(self, phase):
+        return square_shape(phase, self.duty_cycle)
+
+
+class SawtoothOscillator(Oscillator):
+    def _shape(self, phase):
+        return sawtooth_shape(phase)
+
+
+class VibratoOscillator(Oscillator):
+    """Sine oscillator whose pitch is wobbled by a low-frequency oscillator (LFO)."""
+
+    def __init__(self, frequency, amplitude, vibrato_rate=5.0, vibrato_depth=0.02, sample_rate=44100,
+                 dtype=DEFAULT_DTYPE):
+        super().__init__(frequency, amplitude, sample_rate, dtype)
+        self.vibrato_rate = vibrato_rate
+        self.vibrato_depth = vibrato_depth
+        self.position = 0  # Samples rendered so far
+
+    def reset(self):
+        super().reset()
+        self.position = 0
+
+    def process(self, frames):
+        # Absolute time grows without bound, so this one is computed in float64
+        t = (self.position + np.arange(frames)) / self.sample_rate
+        self.position += frames
+        frequency = self.frequency * (1 + self.vibrato_depth * np.sin(2 * np.pi * self.vibrato_rate * t))
+        phase, self.phase = accumulate_phase(self.phase, frequency / self.sample_rate)
+        waveform = self.amplitude * np.sin(2 * np.pi * phase)
+        return waveform.astype(self.dtype, copy=False)
+
+
+class WavetableOscillator(Oscillator):
+    """Band-limited oscillator that reads precomputed tables instead of calling np.sin."""
+
+    def __init__(self, frequency, amplitude, shape="sine", sample_rate=44100, duty_cycle=0.5, dtype=DEFAULT_DTYPE):
+        super().__init__(frequency, amplitude, sample_rate, dtype)
+        if shape not in WAVETABLE_SHAPES:
+            raise ValueError(f"Unknown wavetable shape: {shape}")
+        self.shape = shape
+        self.duty_cycle = duty_cycle
+        self.pulse = shape == "square" and duty_cycle != 0.5
+        # A pulse wave is the difference of two saws offset by the duty cycle
+        self.levels = build_mipmap("sawtooth" if self.pulse else shape, sample_rate, dtype=self.dtype)
+        self._octave_frequency = None
+
+    def _shape(self, phase):
+        # Only look up the mipmap level again when the frequency has changed
+        if self.frequency != self._octave_frequency:
+            self._octave = int(octave_for(self.frequency))
+            self._octave_frequency = self.frequency
+        if self.pulse:
+            return (table_lookup(self.levels, self._octave, phase + (1 - self.duty_cycle))
+                    - table_lookup(self.levels, self._octave, phase) + (2 * self.duty_cycle - 1))
+        return table_lookup(self.levels, self._octave, phase)
+
+
+# ===== NOISE =====
+# Colored noise is uniform white noise through a streaming filter: (b, a) coefficients,
+# scaled so the output has an RMS of about 0.25 and peaks rarely reach full scale.
+NOISE_FILTERS = {
+    # Pink (-3 dB/octave): J. O. Smith's 3-pole, 3-zero approximation
+    "pink": (5.015 * np.array([0.049922035, -0.095993537, 0.050612699, -0.004408786]),
+             np.array([1, -2.494956002, 2.017265875, -0.522189400])),
+    # Brown (-6 dB/octave): a leaky integrator, so it does not drift away from zero
+    "brown": (np.array([0.04304]), np.array([1, -0.995])),
+}
+NOISE_COLORS = ("white",) + tuple(NOISE_FILTERS)
+
+
+class NoiseSource:
+    """Seedable white, pink or brown noise, rendered block by block.
+
+    Built on numpy.random.Generator: the same seed always produces the same
+    stream, so noise renders can be cached. Pink and brown noise keep their
+    filter state between blocks. `process` can write into a preallocated
+    buffer.
+    """
+
+    def __init__(self, color="white", amplitude=1.0, seed=None, dtype=DEFAULT_DTYPE):
+        if color not in NOISE_COLORS:
+            raise ValueError(f"Unknown noise color: {color}")
+        self.color = color
+        self.amplitude = amplitude
+        self.seed = seed
+        self.dtype = np.dtype(dtype)
+        self.reset()
+
+    def reset(self):
+        """Restart the stream from its seed."""
+        self.rng = np.random.default_rng(self.seed)
+        if self.color in NOISE_FILTERS:
+            b, a = NOISE_FILTERS[self.color]
+            self.zi = np.zeros(max(len(a), len(b)) - 1)
+
+    def process(self, frames, out=None):
+        output = np.empty(frames, dtype=self.dtype) if out is None else out[:frames]
+        self.rng.random(out=output, dtype=output.dtype)  # [0, 1)
+        output *= 2
+        output -= 1
+        if self.color in NOISE_FILTERS:
+            b, a = NOISE_FILTERS[self.color]
+            # lfilter has no out= argument, so colored noise makes one temporary
+            output[:], self.zi = lfilter(b, a, output, zi=self.zi)
+        output *= self.amplitude
+        return output
+
+
+def render_blocks(source, frames, block_size=DEFAULT_BLOCK_SIZE, out=None):
+    """Collect `frames` samples from a block source into one buffer (or into `out`).
+
+    A new buffer gets the source's dtype.
+    """
+    output = np.empty(frames, dtype=getattr(source, "dtype", DEFAULT_DTYPE)) if out is None else out
+    for start in range(0, frames, block_size):
+        stop = min(start + block_size, frames)
+        output[start:stop] = source.process(stop - start)
+    return output
+
+
+# ===== ENVELOPE =====
+@lru_cache(maxsize=64)
+def segment_ramp(frames, dtype=DEFAULT_DTYPE):
+    """Shared 0 -> 1 ramp over `frames` samples (like np.linspace(0, 1, frames))."""
+    ramp = np.linspace(0, 1, frames, dtype=dtype)
+    ramp.setflags(write=False)
+    return ramp
+
+
+class EnvelopeGenerator:
+    """Streaming ADSR envelope driven by gate-on and gate-off events.
+
+    Works block by block like the oscillators: after `gate_on` the level
+    ramps through attack and decay and then holds at the sustain level for as
+    long as the gate stays on. `gate_off` starts the release from wherever the
+    envelope currently is. Within a block each segment is one vectorized ramp
+    taken from a cached shape, so no note-length array is ever built.
+    """
+
+    IDLE, ATTACK, DECAY, SUSTAIN, RELEASE = range(5)
+
+    def __init__(self, attack=0.1, decay=0.1, sustain=0.7, release=0.2, sample_rate=44100, dtype=DEFAULT_DTYPE):
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.attack_samples = int(sample_rate * attack)
+        self.decay_samples = int(sample_rate * decay)
+        self.sustain = sustain
+        self.release_samples = int(sample_rate * release)
+        self.stage = self.IDLE
+        self.position = 0  # Samples into the current stage
+        self.level = 0.0
+        self.start_level = 0.0  # Level the current attack or release started from
+
+    @property
+    def finished(self):
+        return self.stage == self.IDLE
+
+    def gate_on(self):
+        """Start (or retrigger) the note; the attack starts from the current level."""
+        self.start_level = self.level
+        self._enter(self.ATTACK)
+
+    def gate_off(self):
+        """Release the note from the current level."""
+        if self.stage != self.IDLE:
+            self.start_level = self.level
+            self._enter(self.RELEASE)
+
+    def _enter(self, stage):
+        self.stage = stage
+        self.position = 0
+        # Skip segments that are zero samples long
+        if stage == self.ATTACK and self.attack_samples == 0:
+            self.level = 1.0
+            self._enter(self.DECAY)
+        elif stage == self.DECAY and self.decay_samples == 0:
+            self.level = self.sustain
+            self._enter(self.SUSTAIN)
+        elif stage == self.RELEASE and self.release_samples == 0:
+            self.level = 0.0
+            self.stage = self.IDLE
+
+    def process(self, frames, out=None):
+        """Render the next `frames` envelope samples, into `out` if given."""
+        output = np.empty(frames, dtype=self.dtype) if out is None else out[:frames]
+        done = 0
+        while done < frames:
+            segment = output[done:]
+            if self.stage in (self.ATTACK, self.DECAY, self.RELEASE):
+                length = {self.ATTACK: self.attack_samples, self.DECAY: self.decay_samples,
+                          self.RELEASE: self.release_samples}[self.stage]
+                count = min(frames - done, length - self.position)
+                ramp = segment_ramp(length, self.dtype)[self.position:self.position + count]
+                if self.stage == self.ATTACK:
+                    start, stop = self.start_level, 1.0
+                elif self.stage == self.DECAY:
+                    start, stop = 1.0, self.sustain
+                else:
+                    start, stop = self.start_level, 0.0
+                np.multiply(ramp, stop - start, out=segment[:count])
+                segment[:count] += start
+            else:
+                # Sustain holds until gate_off, idle is silent
+                count = frames - done
+                segment.fill(self.sustain if self.stage == self.SUSTAIN else 0.0)
+
+            self.position += count
+            done += count
+            self.level = float(segment[count - 1])
+            if self.stage == self.ATTACK and self.position >= self.attack_samples:
+                self._enter(self.DECAY)
+            elif self.stage == self.DECAY and self.position >= self.decay_samples:
+                self._enter(self.SUSTAIN)
+            elif self.stage == self.RELEASE and self.position >= self.release_samples:
+                self.stage = self.IDLE
+        return output
+
+
+class EnvelopedSource:
+    """Block source that multiplies any oscillator by an envelope generator."""
+
+    def __init__(self, source, envelope):
+        self.source = source
+        self.envelope = envelope
+        self.dtype = source.dtype
+        self._scratch = np.empty(DEFAULT_BLOCK_SIZE, dtype=envelope.dtype)
+
+    @property
+    def finished(self):
+        return self.envelope.finished
+
+    def gate_on(self):
+        self.envelope.gate_on()
+        if hasattr(self.source, "gate_on"):  # Sources with their own envelopes, such as ModulatedVoice
+            self.source.gate_on()
+
+    def gate_off(self):
+        self.envelope.gate_off()
+        if hasattr(self.source, "gate_off"):
+            self.source.gate_off()
+
+    def process(self, frames):
+        if len(self._scratch) < frames:
+            self._scratch = np.empty(frames, dtype=self.envelope.dtype)
+        block = self.source.process(frames)
+        block *= self.envelope.process(frames, out=self._scratch)
+        return block
+
+
+def iter_note(source, frames, attack=0.1, decay=0.1, sustain=0.7, release=0.2, sample_rate=44100,
+              block_size=DEFAULT_BLOCK_SIZE):
+    """Yield a `frames`-long note block by block: gate on at the start, gate off so the release ends with the note."""
+    envelope = EnvelopeGenerator(attack, decay, sustain, release, sample_rate, source.dtype)
+    note = EnvelopedSource(source, envelope)
+    release_start = max(frames - envelope.release_samples, 0)
+    note.gate_on()
+    for start in range(0, release_start, block_size):
+        yield note.process(min(block_size, release_start - start))
+    note.gate_off()
+    for start in range(release_start, frames, block_size):
+        yield note.process(min(block_size, frames - start))
+
+
+@timed("render_note")
+def render_note(source, frames, attack=0.1, decay=0.1, sustain=0.7, release=0.2, sample_rate=44100, out=None):
+    """Render a `frames`-long note into one buffer (or into `out`), see iter_note."""
+    output = np.empty(frames, dtype=source.dtype) if out is None else out[:frames]
+    position = 0
+    for block in iter_note(source, frames, attack, decay, sustain, release, sample_rate):
+        output[position:position + len(block)] = block
+        position += len(block)
+    return output
+
 
 # Function to generate sine wave
+@timed("generate_sine_wave", returned_duration)
 def generate_sine_wave(frequency, amplitude, duration=1.0, sample_rate=44100, 
-                       attack=0.1, decay=0.1, sustain=0.7, release=0.2):
+                       attack=0.1, decay=0.1, sustain=0.7, release=0.2, dtype=DEFAULT_DTYPE):
     """ Generate a sine wave with a flexible ADSR envelope where duration adjusts dynamically """
 
     # Calculate total duration based on ADSR phases
     total_duration = attack + decay + sustain + release
-    t = np.linspace(0, total_duration, int(sample_rate * total_duration), endpoint=False)
-    waveform = amplitude * np.sin(2 * np.pi * frequency * t)
+    oscillator = WavetableOscillator(frequency, amplitude, "sine", sample_rate, dtype=dtype)
+    waveform = render_note(oscillator, int(sample_rate * total_duration), attack, decay, sustain, release, sample_rate)
+    return waveform, sample_rate, total_duration
 
-    # Compute sample counts
-    attack_samples = int(sample_rate * attack)
-    decay_samples = int(sample_rate * decay)
-    sustain_samples = int(sample_rate * sustain)
-    release_samples = int(sample_rate * release)
-
-    env = np.ones(len(waveform))
+@timed("generate_square_wave", returned_duration)
+def generate_square_wave(frequency, amplitude, duty_cycle=0.5, duration=1.0, sample_rate=44100, dtype=DEFAULT_DTYPE):
+    """Generate a square wave with a specified duty cycle."""
+    oscillator = WavetableOscillator(frequency, amplitude, "square", sample_rate, duty_cycle, dtype)
+    waveform = render_blocks(oscillator, int(sample_rate * duration))
+    return waveform, sample_rate, duration  # Return all three values
 
-    # Apply ADSR envelope
-    env[:attack_samples] = np.linspace(0, 1, attack_samples)  # Attack
-    env[attack_samples:attack_samples+decay_samples] = np.linspace(1, sustain, decay_samples)  # Decay
-    env[attack_samples+decay_samples:attack_samples+decay_samples+sustain_samples] = sustain  # Sustain
-    env[-release_samples:] = np.linspace(sustain, 0, release_samples)  # Release
 
-    return waveform * env, sample_rate, total_duration
+@timed("generate_noise")
+def generate_noise(amplitude, duration=1.0, sample_rate=44100, dtype=DEFAULT_DTYPE, color="white", seed=None,
+                   out=None):
+    """Generate white, pink or brown noise (into `out` when given)."""
+    return NoiseSource(color, amplitude, seed, dtype).process(int(sample_rate * duration), out=out)
 
-def generate_square_wave(frequency, amplitude, duty_cycle=0.5, duration=1.0, sample_rate=44100):
-    """Generate a square wave with a specified duty cycle."""
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    waveform = amplitude * np.sign(np.sin(2 * np.pi * frequency * t) + (2 * duty_cycle - 1))
-    return waveform, sample_rate, duration  # Return all three values
+# scipy.signal takes over a second to import and only the low-pass filter needs it,
+# so it is imported on first use rather than with this module
+def butter(*args, **kwargs):
+    from scipy.signal import butter
+    return butter(*args, **kwargs)
 
+def sosfilt(*args, **kwargs):
+    from scipy.signal import sosfilt
+    return sosfilt(*args, **kwargs)
 
-def generate_noise(amplitude, duration=1.0, sample_rate=44100):
-    """Generate white noise."""
-    return amplitude * np.random.uniform(-1, 1, int(sample_rate * duration))
+def lfilter(*args, **kwargs):
+    from scipy.signal import lfilter
+    return lfilter(*args, **kwargs)
 
 # Function to apply a low-pass filter (optional effect)
-def apply_lowpass_filter(data, cutoff=1000, sample_rate=44100, order=5):
+@lru_cache(maxsize=256)
+def design_lowpass(cutoff, sample_rate=44100, order=5):
+    """Butterworth low-pass design as second-order sections, cached per setting.
+
+    Kept in float64 even for float32 signals: with low cutoffs the poles sit
+    close to z = 1, and float32 coefficients and state drift audibly.
+    """
     nyquist = 0.5 * sample_rate
     normal_cutoff = cutoff / nyquist
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    return lfilter(b, a, data)
+    return butter(order, normal_cutoff, btype='low', analog=False, output='sos')
+
+@timed("apply_lowpass_filter")
+def apply_lowpass_filter(data, cutoff=1000, sample_rate=44100, order=5):
+    """Low-pass filter `data`, returning the same float dtype it was given."""
+    dtype = np.result_type(data.dtype, np.float32)
+    return sosfilt(design_lowpass(cutoff, sample_rate, order), data).astype(dtype, copy=False)
+
+
+class LowpassFilter:
+    """Stateful low-pass filter that can be run block by block without clicks.
 
+    The filter state (`zi`) is carried from one block to the next. When the
+    cutoff changes, the next block is rendered with both the old and the new
+    design and crossfaded, so the cutoff can be swept live.
+    """
+
+    def __init__(self, cutoff=1000, sample_rate=44100, order=5, dtype=DEFAULT_DTYPE):
+        self.sample_rate = sample_rate
+        self.order = order
+        self.cutoff = cutoff
+        self.dtype = np.dtype(dtype)
+        self.sos = design_lowpass(cutoff, sample_rate, order)
+        self.zi = np.zeros((self.sos.shape[0], 2))  # float64 state, see design_lowpass
+        self._pending_sos = None
+
+    def set_cutoff(self, cutoff):
+        if cutoff == self.cutoff:
+            return
+        self.cutoff = cutoff
+        self._pending_sos = design_lowpass(cutoff, self.sample_rate, self.order)
+
+    def reset(self):
+        self.zi = np.zeros_like(self.zi)
+
+    def process(self, block):
+        """Filter one block, continuing from the previous block's state."""
+        if self._pending_sos is None:
+            output, self.zi = sosfilt(self.sos, block, zi=self.zi)
+            return output.astype(self.dtype, copy=False)
+
+        # Crossfade from the old design to the new one over this block
+        old_output, _ = sosfilt(self.sos, block, zi=self.zi)
+        new_output, self.zi = sosfilt(self._pending_sos, block, zi=self.zi)
+        fade = np.linspace(0, 1, len(block), endpoint=False, dtype=self.dtype)
+        self.sos = self._pending_sos
+        self._pending_sos = None
+        return (old_output + fade * (new_output - old_output)).astype(self.dtype, copy=False)
+
+@timed("convert_to_bit_depth")
 def convert_to_bit_depth(samples, bit_depth):
     """Convert samples to the specified bit depth."""
     if bit_depth == 8:
@@ -56,27 +460,24 @@ def convert_to_bit_depth(samples, bit_depth):
     else:
         raise ValueError("Unsupported bit depth. Use 8 or 16.")
     
-def generate_sawtooth_wave(frequency, amplitude, duration=1.0, sample_rate=44100):
+@timed("generate_sawtooth_wave", returned_duration)
+def generate_sawtooth_wave(frequency, amplitude, duration=1.0, sample_rate=44100, dtype=DEFAULT_DTYPE):
     """Generate a sawtooth wave."""
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    waveform = 2 * (t * frequency - np.floor(t * frequency)) - 1  # Sawtooth formula
-    return amplitude * waveform, sample_rate, duration  # Return all three values
+    oscillator = WavetableOscillator(frequency, amplitude, "sawtooth", sample_rate, dtype=dtype)
+    waveform = render_blocks(oscillator, int(sample_rate * duration))
+    return waveform, sample_rate, duration  # Return all three values
 
 import numpy as np
 
-def generate_vibrato(frequency, amplitude, vibrato_rate=5.0, vibrato_depth=0.02, duration=1.0, sample_rate=44100):
+@timed("generate_vibrato", returned_duration)
+def generate_vibrato(frequency, amplitude, vibrato_rate=5.0, vibrato_depth=0.02, duration=1.0, sample_rate=44100,
+                     dtype=DEFAULT_DTYPE):
     """Generate a sine wave with vibrato effect."""
-
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-
-    # Create a low-frequency oscillation (LFO) for vibrato effect
-    vibrato = vibrato_depth * frequency * np.sin(2 * np.pi * vibrato_rate * t)
-
-    # Apply vibrato modulation to the main sine wave frequency
-    waveform = amplitude * np.sin(2 * np.pi * (frequency + vibrato) * t)
-
+    oscillator = VibratoOscillator(frequency, amplitude, vibrato_rate, vibrato_depth, sample_rate, dtype)
+    waveform = render_blocks(oscillator, int(sample_rate * duration))
     return waveform, sample_rate, duration
 
+@timed("apply_distortion")
 def apply_distortion(waveform, gain=5.0, mix=0.5):
     """Apply a soft-clipping distortion effect to an audio waveform."""
     # Apply gain
@@ -87,4 +488,4 @@ def apply_distortion(waveform, gain=5.0, mix=0.5):
 
     # Blend distorted signal with original
     output = (1 - mix) * waveform + mix * distorted
-    return output
\ No newline at end of file
+    return output
@@ -0,0 +1,77 @@
+"""Headless batch renderer: turns a file of patch descriptions into audio files.
+
+Each line of the input is a JSON object using the keys of
+rendering.DEFAULT_PATCH, plus an optional "name" for the output file:
+
+    {"name": "pluck_a4", "waveform": "square", "frequency": 440, "lowpass": true}
+
+Usage:
+    python batch_render.py patches.jsonl -o renders --format flac --workers 8
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import soundfile as sf
+
+from rendering import PatchRenderer, full_patch
+
+FORMATS = {"wav": "WAV", "flac": "FLAC"}
+
+
+def load_patches(path):
+    """Read one patch dict per non-empty line of a JSON lines file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def render_to_file(job):
+    """Render one patch and stream it to disk. Returns the rendered audio length in seconds.
+
+    The patch is rendered and written block by block, so memory use does not
+    depend on the patch's length.
+    """
+    patch, path, file_format = job
+    patch = full_patch(patch)
+    with sf.SoundFile(path, "w", samplerate=patch["sample_rate"], channels=1, format=FORMATS[file_format]) as f:
+        _, _, duration = PatchRenderer().render_offline(patch, f)
+    return duration
+
+
+def build_jobs(patches, output_dir, file_format):
+    jobs = []
+    for index, patch in enumerate(patches):
+        patch = dict(patch)
+        name = patch.pop("name", f"patch_{index:05d}")
+        jobs.append((patch, os.path.join(output_dir, f"{name}.{file_format}"), file_format))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render patch descriptions to audio files without the GUI.")
+    parser.add_argument("patches", help="JSON lines file with one patch per line")
+    parser.add_argument("-o", "--output-dir", default="renders")
+    parser.add_argument("-f", "--format", choices=sorted(FORMATS), default="wav")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: all CPUs)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = build_jobs(load_patches(args.patches), args.output_dir, args.format)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        chunksize = max(1, len(jobs) // (4 * args.workers))
+        audio_seconds = sum(pool.map(render_to_file, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    print(f"Rendered {len(jobs)} patches ({audio_seconds:.1f} s of audio) "
+          f"in {elapsed:.2f} s with {args.workers} workers")
+    print(f"Throughput: {len(jobs) / elapsed:.1f} patches/s, "
+          f"real-time factor: {audio_seconds / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,609 @@
+"""Benchmarks for audio_utils.
+
+    python benchmarks.py                      # full suite, prints a table
+    python benchmarks.py --quick -o run.json  # smaller grid, saves results
+    python benchmarks.py --baseline base.json # flags cases slower than the baseline
+    python benchmarks.py --micro              # the focused comparisons below the suite
+    python benchmarks.py --check-precision    # float32 renders against the float64 reference
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.signal import butter, lfilter
+
+from audio_utils import (DEFAULT_BLOCK_SIZE, DEFAULT_DTYPE, NOISE_COLORS, EnvelopeGenerator, LowpassFilter, NoiseSource,
+                         SawtoothOscillator, SineOscillator, SquareOscillator, WavetableOscillator, apply_distortion, apply_lowpass_filter,
+                         convert_to_bit_depth, generate_noise, generate_sawtooth_wave, generate_sine_wave,
+                         generate_square_wave, generate_vibrato, render_blocks)
+from effects import BitCrushStage, BufferPool
+from export import write_audio
+from live import LiveVoice, ParameterMailbox
+from modulation import TARGETS, ModulationMatrix
+from rendering import render_patch
+from sequencer import Sequencer, midi_to_frequency
+from spectrum import IncrementalSTFT
+from sweeps import batch_sawtooth_wave, batch_sine_wave, batch_square_wave, render_sweep, sweep_grid
+from voice_bank import VoiceBank
+
+
+def time_call(func, repeats=20):
+    """Return the best wall-clock time of `repeats` calls to func, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# ===== LOW-PASS FILTER =====
+def legacy_lowpass_filter(data, cutoff=1000, sample_rate=44100, order=5):
+    """The original apply_lowpass_filter: redesigns the filter on every call."""
+    nyquist = 0.5 * sample_rate
+    b, a = butter(order, cutoff / nyquist, btype='low', analog=False)
+    return lfilter(b, a, data)
+
+
+def bench_lowpass(duration=1.0, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE):
+    data = np.random.uniform(-1, 1, int(sample_rate * duration))
+    blocks = [data[i:i + block_size] for i in range(0, len(data), block_size)]
+
+    def run_blocks():
+        lowpass = LowpassFilter(1000, sample_rate)
+        for block in blocks:
+            lowpass.process(block)
+
+    def sweep_blocks():
+        lowpass = LowpassFilter(1000, sample_rate)
+        for i, block in enumerate(blocks):
+            lowpass.set_cutoff(100 + (i % 50) * 100)  # Cutoff slider being dragged
+            lowpass.process(block)
+
+    def legacy_blocks():
+        for i, block in enumerate(blocks):
+            legacy_lowpass_filter(block, 100 + (i % 50) * 100, sample_rate)
+
+    return {
+        "legacy one-shot": time_call(lambda: legacy_lowpass_filter(data, 1000, sample_rate)),
+        "cached one-shot": time_call(lambda: apply_lowpass_filter(data, 1000, sample_rate)),
+        "legacy per block (sweep)": time_call(legacy_blocks),
+        "stateful per block": time_call(run_blocks),
+        "stateful per block (sweep)": time_call(sweep_blocks),
+    }
+
+
+# ===== OSCILLATORS =====
+NAIVE_OSCILLATORS = {"sine": SineOscillator, "square": SquareOscillator, "sawtooth": SawtoothOscillator}
+
+
+def bench_oscillators(frequency=440, duration=1.0, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE):
+    """Naive formula oscillators against wavetable lookup, one block at a time."""
+    frames = int(sample_rate * duration)
+    results = {}
+    for shape, naive in NAIVE_OSCILLATORS.items():
+        results[f"{shape} naive"] = time_call(
+            lambda: render_blocks(naive(frequency, 1.0, sample_rate=sample_rate), frames, block_size))
+        results[f"{shape} wavetable"] = time_call(
+            lambda: render_blocks(WavetableOscillator(frequency, 1.0, shape, sample_rate), frames, block_size))
+    return results
+
+
+def aliasing_ratio(waveform, frequency, sample_rate):
+    """Fraction of spectral energy that is not on a harmonic of `frequency`.
+
+    Expects exactly one second of audio and an integer frequency, so every
+    harmonic falls on an FFT bin.
+    """
+    # In float64: a float32 FFT leaves too little precision to resolve the wavetables' aliasing
+    power = np.abs(np.fft.rfft(np.asarray(waveform, dtype=np.float64))) ** 2
+    harmonic_bins = np.arange(frequency, len(power), frequency)
+    return 1 - power[harmonic_bins].sum() / power.sum()
+
+
+def bench_aliasing(frequencies=(500, 2000, 5000), sample_rate=44100):
+    results = {}
+    for frequency in frequencies:
+        for shape in ("square", "sawtooth"):
+            naive = render_blocks(NAIVE_OSCILLATORS[shape](frequency, 1.0, sample_rate=sample_rate), sample_rate)
+            table = render_blocks(WavetableOscillator(frequency, 1.0, shape, sample_rate), sample_rate)
+            results[f"{shape} {frequency} Hz"] = (aliasing_ratio(naive, frequency, sample_rate),
+                                                  aliasing_ratio(table, frequency, sample_rate))
+    return results
+
+
+# ===== VOICE BANK =====
+def bench_voice_bank(voice_counts=(1, 2, 4, 8, 16, 32, 64), block_size=DEFAULT_BLOCK_SIZE, sample_rate=44100):
+    """Time one block for a growing number of held voices."""
+    results = {}
+    for count in voice_counts:
+        bank = VoiceBank(max_voices=count, waveform="sawtooth", sample_rate=sample_rate)
+        for i in range(count):
+            bank.note_on(110 * 2 ** (i / 12), amplitude=1 / count)
+        results[f"{count} voices"] = time_call(lambda: bank.process(block_size), repeats=200)
+    return results
+
+
+# ===== MODULATION =====
+def modulation_matrix(control_period):
+    """Twelve LFOs and an envelope spread over all four targets."""
+    matrix = ModulationMatrix(control_period=control_period)
+    for i, target in enumerate(list(TARGETS) * 3):
+        matrix.add_lfo(f"lfo{i}", rate=1 + i)
+        matrix.connect(f"lfo{i}", target, 0.5)
+    matrix.add_envelope("env", 0.01, 0.2, 0.3, 0.1)
+    matrix.connect("env", "cutoff", 2.0)
+    matrix.connect("env", "pitch", 0.1)
+    return matrix
+
+
+def bench_modulation(block_sizes=(DEFAULT_BLOCK_SIZE, 4096), control_periods=(1, 32), sample_rate=44100):
+    """Cost of one second of modulation signals, audio rate (period 1) against control rate."""
+    results = {}
+    for block_size in block_sizes:
+        for period in control_periods:
+            def run():
+                matrix = modulation_matrix(period)
+                matrix.gate_on()
+                for _ in range(sample_rate // block_size):
+                    matrix.process(block_size)
+            results[f"{block_size} frames, period {period}"] = time_call(run, repeats=5)
+    return results
+
+
+# ===== SPECTRUM VIEW =====
+def bench_spectrum(seconds=10.0, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE):
+    """Spectrogram of a long render: from scratch, streaming one more block, and decimated for display."""
+    signal, _, _ = generate_sawtooth_wave(220, 0.5, duration=seconds, sample_rate=sample_rate)
+    block = signal[:block_size]
+    stft = IncrementalSTFT(sample_rate)
+    stft.analyze(signal)
+    return {
+        f"{seconds:g} s from scratch": time_call(lambda: IncrementalSTFT(sample_rate).analyze(signal), repeats=5),
+        "same render again": time_call(lambda: stft.analyze(signal)),
+        "stream one more block": time_call(lambda: stft.extend(block)),
+        "decimate to 600 x 300": time_call(lambda: stft.display_image(600, 300)),
+    }
+
+
+# ===== SEQUENCER =====
+def random_pattern(notes=10000, seconds=300.0, seed=0):
+    """(time, frequency, velocity, duration) notes over two octaves with three note lengths."""
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(0, seconds, notes))
+    pitches = rng.integers(48, 72, notes)
+    velocities = rng.uniform(0.3, 1.0, notes)
+    durations = rng.choice([0.125, 0.25, 0.5], notes)
+    return [(float(t), midi_to_frequency(int(p)), float(v), float(d))
+            for t, p, v, d in zip(times, pitches, velocities, durations)]
+
+
+def bench_sequencer(notes=10000, seconds=300.0):
+    """Render a long pattern block by block; returns seconds, real-time factor and peak memory."""
+    sequencer = Sequencer({"waveform": "square", "lowpass": True, "attack": 0.01, "decay": 0.05, "release": 0.1})
+    sequencer.add_notes(random_pattern(notes, seconds))
+
+    def run():
+        for _ in sequencer.iter_blocks():
+            pass
+
+    elapsed = time_call(run, repeats=1)  # First run: every distinct note is rendered
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, sequencer.frames / sequencer.sample_rate / elapsed, peak, sequencer.cache.misses
+
+
+# ===== PARAMETER SWEEPS =====
+def bench_sweep(note_seconds=(0.1, 1.1)):
+    """64 variants (16 frequencies x 4 cutoffs) rendered one by one against render_sweep."""
+    results = {}
+    for seconds in note_seconds:
+        patch = {"waveform": "sawtooth", "lowpass": True, "distortion": True,
+                 "attack": seconds / 10, "decay": seconds / 10, "hold": seconds * 0.6, "release": seconds / 5}
+        sweep = sweep_grid(frequency=np.geomspace(55, 1760, 16), cutoff=[300, 1000, 3000, 8000])
+        variants = [{**patch, "frequency": frequency, "cutoff": cutoff}
+                    for frequency, cutoff in zip(sweep["frequency"], sweep["cutoff"])]
+        results[f"{seconds:g} s notes, loop"] = time_call(lambda: [render_patch(p) for p in variants], repeats=5)
+        results[f"{seconds:g} s notes, batch"] = time_call(lambda: render_sweep(patch, sweep), repeats=5)
+    return results
+
+
+# ===== BIT CRUSHER AND EXPORT =====
+def peak_memory(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_bit_crush(seconds=300.0, sample_rate=44100):
+    """Crushing and exporting a long render: the old uint8/int16 path against the in-place stage and write_audio.
+
+    Returns {case: (seconds, peak traced bytes)}.
+    """
+    import soundfile as sf
+    signal = np.random.default_rng(0).uniform(-0.9, 0.9, int(seconds * sample_rate)).astype(DEFAULT_DTYPE)
+    crushed = signal.copy()  # Crushed in place again on every repeat, which costs the same
+    pool = BufferPool()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "crushed.wav")
+
+        def legacy():
+            # convert_to_bit_depth, widened to int16 for playback and written as 16-bit
+            widened = (convert_to_bit_depth(signal, 8).astype(np.int16) - 128) * 256
+            sf.write(path, widened, sample_rate, subtype="PCM_16")
+
+        def fused(subtype):
+            BitCrushStage(8).process(crushed, pool)
+            write_audio(crushed, path, sample_rate, "WAV", subtype)
+
+        cases = {
+            "8-bit, uint8 -> int16 -> PCM_16": legacy,
+            "8-bit, in place -> PCM_16": lambda: fused("PCM_16"),
+            "8-bit, in place -> PCM_U8": lambda: fused("PCM_U8"),
+            "16-bit, sf.write from float": lambda: sf.write(path, signal, sample_rate, subtype="PCM_16"),
+            "16-bit, write_audio": lambda: write_audio(signal, path, sample_rate, "WAV", "PCM_16"),
+        }
+        return {name: (time_call(func, repeats=3), peak_memory(func)) for name, func in cases.items()}
+
+
+# ===== LIVE PREVIEW =====
+def bench_live(seconds=3.0, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE, publish_interval=0.001):
+    """LiveVoice driven on a simulated audio clock while another thread publishes snapshots and plots.
+
+    The "GUI" thread publishes a new frequency and cutoff every
+    `publish_interval` seconds and does some NumPy work in between, like a
+    slider drag with the waveform redrawing. Returns p50 and p99 block times
+    in seconds, the number of blocks that missed their deadline, and the
+    number of snapshots published.
+    """
+    patch = {"waveform": "sawtooth", "lowpass": True, "distortion": True, "vibrato": True}
+    parameters = ParameterMailbox(patch)
+    voice = LiveVoice(parameters, sample_rate)
+    period = block_size / sample_rate
+    blocks = int(seconds / period)
+    durations = np.zeros(blocks)
+    misses = 0
+    done = threading.Event()
+
+    def gui():
+        rng = np.random.default_rng(0)
+        while not done.is_set():
+            parameters.publish({**patch, "frequency": float(rng.uniform(110, 880)),
+                                "cutoff": float(rng.uniform(300, 5000))})
+            np.sort(rng.random(20000))  # Stand-in for redrawing the plot
+            time.sleep(publish_interval)
+
+    thread = threading.Thread(target=gui)
+    thread.start()
+    deadline = time.perf_counter()
+    for index in range(blocks):
+        deadline += period
+        start = time.perf_counter()
+        voice.process(block_size)
+        finished = time.perf_counter()
+        durations[index] = finished - start
+        if finished > deadline:
+            misses += 1
+            deadline = finished  # The device would have played silence; carry on from here
+        else:
+            time.sleep(deadline - finished)
+    done.set()
+    thread.join()
+    p50, p99 = np.percentile(durations, [50, 99])
+    return p50, p99, misses, parameters.latest[0]
+
+
+# ===== SUITE =====
+DURATIONS = (0.1, 1.0, 10.0, 60.0)
+SAMPLE_RATES = (22050, 44100, 48000, 96000)
+BLOCK_SIZES = (128, 512, 2048)
+QUICK_DURATIONS = (0.1, 1.0)
+QUICK_SAMPLE_RATES = (44100, 96000)
+
+
+def sine_adsr(duration):
+    """ADSR times whose total is `duration`, for generate_sine_wave."""
+    sustain = min(0.7, duration / 2)
+    segment = (duration - sustain) / 3
+    return dict(attack=segment, decay=segment, sustain=sustain, release=segment)
+
+
+def whole_buffer_cases(duration, sample_rate):
+    """(name, setup) pairs; setup() returns the call to time. Inputs are built outside the timing."""
+    def signal():
+        return np.random.default_rng(0).uniform(-0.5, 0.5, int(sample_rate * duration)).astype(DEFAULT_DTYPE)
+
+    return [
+        ("generate_sine_wave", lambda: lambda: generate_sine_wave(440, 0.5, sample_rate=sample_rate, **sine_adsr(duration))),
+        ("generate_square_wave", lambda: lambda: generate_square_wave(440, 0.5, duration=duration, sample_rate=sample_rate)),
+        ("generate_sawtooth_wave", lambda: lambda: generate_sawtooth_wave(440, 0.5, duration=duration, sample_rate=sample_rate)),
+        ("generate_vibrato", lambda: lambda: generate_vibrato(440, 0.5, duration=duration, sample_rate=sample_rate)),
+        ("generate_noise", lambda: lambda: generate_noise(0.5, duration=duration, sample_rate=sample_rate)),
+        ("generate_noise pink", lambda: lambda: generate_noise(0.5, duration=duration, sample_rate=sample_rate,
+                                                               color="pink")),
+        ("apply_lowpass_filter", lambda: (lambda data: lambda: apply_lowpass_filter(data, 1000, sample_rate))(signal())),
+        ("apply_distortion", lambda: (lambda data: lambda: apply_distortion(data))(signal())),
+        ("convert_to_bit_depth 8", lambda: (lambda data: lambda: convert_to_bit_depth(data, 8))(signal())),
+        ("convert_to_bit_depth 16", lambda: (lambda data: lambda: convert_to_bit_depth(data, 16))(signal())),
+    ]
+
+
+def block_cases(duration, sample_rate, block_size):
+    """Streaming objects driven block by block, like the audio callback does."""
+    frames = int(sample_rate * duration)
+
+    def lowpass():
+        data = np.random.default_rng(0).uniform(-0.5, 0.5, block_size).astype(DEFAULT_DTYPE)
+        lowpass = LowpassFilter(1000, sample_rate)
+
+        def run():
+            for _ in range(0, frames, block_size):
+                lowpass.process(data)
+        return run
+
+    def envelope():
+        def run():
+            envelope = EnvelopeGenerator(sample_rate=sample_rate, sustain=0.7)
+            envelope.gate_on()
+            render_blocks(envelope, frames, block_size)
+        return run
+
+    cases = [(f"WavetableOscillator {shape}",
+              (lambda shape: lambda: lambda: render_blocks(
+                  WavetableOscillator(440, 0.5, shape, sample_rate), frames, block_size))(shape))
+             for shape in ("sine", "square", "sawtooth")]
+    cases += [(f"NoiseSource {color}",
+               (lambda color: lambda: lambda: render_blocks(NoiseSource(color, 0.5, seed=0), frames, block_size))(color))
+              for color in NOISE_COLORS]
+    return cases + [("LowpassFilter", lowpass), ("EnvelopeGenerator", envelope)]
+
+
+def measure(name, setup, duration, sample_rate, block_size=None, min_time=0.2, max_repeats=20):
+    """Time one case and record its peak traced memory in a separate call."""
+    func = setup()
+    func()  # Warm up caches (filter designs, wavetables)
+    # Repeat until min_time has been spent, but at least twice
+    first = time_call(func, repeats=1)
+    repeats = int(min(max_repeats, max(2, min_time / max(first, 1e-9))))
+    seconds = min(first, time_call(func, repeats=repeats))
+
+    tracemalloc.start()
+    func()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    frames = int(sample_rate * duration)
+    return {
+        "name": name,
+        "duration": duration,
+        "sample_rate": sample_rate,
+        "block_size": block_size,
+        "seconds": seconds,
+        "ns_per_sample": seconds / frames * 1e9,
+        "realtime_factor": duration / seconds,
+        "peak_bytes": peak_bytes,
+    }
+
+
+def run_suite(durations=DURATIONS, sample_rates=SAMPLE_RATES, block_sizes=BLOCK_SIZES, progress=None):
+    results = []
+    for sample_rate in sample_rates:
+        for duration in durations:
+            for name, setup in whole_buffer_cases(duration, sample_rate):
+                results.append(measure(name, setup, duration, sample_rate))
+                if progress:
+                    progress(results[-1])
+            for block_size in block_sizes:
+                for name, setup in block_cases(duration, sample_rate, block_size):
+                    results.append(measure(name, setup, duration, sample_rate, block_size))
+                    if progress:
+                        progress(results[-1])
+    return results
+
+
+def case_key(result):
+    return (result["name"], result["duration"], result["sample_rate"], result["block_size"])
+
+
+def save_results(path, results):
+    document = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+
+
+def compare_results(results, baseline_path, threshold=1.25):
+    """Return the cases whose ns/sample grew by more than `threshold` times the baseline."""
+    with open(baseline_path) as f:
+        baseline = {case_key(result): result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is not None and result["ns_per_sample"] > threshold * old["ns_per_sample"]:
+            regressions.append((result, result["ns_per_sample"] / old["ns_per_sample"]))
+    return regressions
+
+
+def format_result(result):
+    block = f"block {result['block_size']}" if result["block_size"] else "whole"
+    return (f"  {result['name']:<30} {result['duration']:>5.1f} s {result['sample_rate']:>6} Hz {block:<10} "
+            f"{result['ns_per_sample']:8.2f} ns/sample {result['realtime_factor']:9.1f}x RT "
+            f"{result['peak_bytes'] / 1e6:8.2f} MB")
+
+
+# ===== PRECISION =====
+# Max abs error against float64, about -74 dBFS. The distortion stage multiplies
+# the oscillator's float32 rounding error by its gain, which puts bright
+# distorted patches just above 1e-4.
+PRECISION_TOLERANCE = 2e-4
+
+
+def check_precision(tolerance=PRECISION_TOLERANCE):
+    """Render patches in float32 and float64 and return (patch, max abs error) for each.
+
+    Noise is left out because it is random, and bit crushing because a
+    float32 rounding difference can legitimately move a sample to the
+    neighbouring 8-bit level.
+    """
+    results = []
+    for waveform, frequency, cutoff, lowpass, distortion, vibrato, sample_rate in itertools.product(
+            ("sine", "square", "sawtooth"), (110, 2000), (100, 5000), (False, True), (False, True), (False, True),
+            (44100, 96000)):
+        patch = dict(waveform=waveform, frequency=frequency, cutoff=cutoff, lowpass=lowpass,
+                     distortion=distortion, vibrato=vibrato, sample_rate=sample_rate)
+        single = render_patch({**patch, "dtype": "float32"})[0]
+        double = render_patch({**patch, "dtype": "float64"})[0]
+        results.append((patch, float(np.max(np.abs(single - double)))))
+    return results
+
+
+def check_batch_generators(frequencies=(110, 440, 2000), amplitude=0.5):
+    """Compare the sweeps batch generators, called with their defaults, with the per-voice generators.
+
+    Returns (name, max abs error) per generator; every row of a batch
+    should match the single-voice render of its frequency.
+    """
+    cases = {
+        "batch_sine_wave": (batch_sine_wave, generate_sine_wave),
+        "batch_square_wave": (batch_square_wave, generate_square_wave),
+        "batch_sawtooth_wave": (batch_sawtooth_wave, generate_sawtooth_wave),
+    }
+    results = []
+    for name, (batch, single) in cases.items():
+        waveforms = batch(frequencies, amplitude)[0]
+        error = 0.0
+        for row, frequency in zip(waveforms, frequencies):
+            reference = single(frequency, amplitude)[0]
+            error = max(error, float(np.max(np.abs(row[:len(reference)] - reference))))
+        results.append((name, error))
+    return results
+
+
+def check_bit_crush(bit_depths=(1, 2), amplitudes=(0.5, 1.0), frames=44100):
+    """Crush one second of a 441 Hz sine (whole periods, no exact zeros) at each depth and amplitude, and silence.
+
+    Returns (case, error) pairs: the largest distance of a sample from the
+    depth's mid-rise levels +-(k + 1/2) / 2**(bits - 1), the DC offset, and
+    the peak of the crushed silence. All of them should be zero.
+    """
+    pool = BufferPool()
+    sine = np.sin(2 * np.pi * 441 * np.arange(frames) / 44100 + 0.5)
+    results = []
+    for bits in bit_depths:
+        half = 2 ** (bits - 1)
+        levels = (np.arange(-half, half) + 0.5) / half
+        for amplitude in amplitudes:
+            crushed = (amplitude * sine).astype(DEFAULT_DTYPE)
+            BitCrushStage(bits).process(crushed, pool)
+            off_level = np.min(np.abs(crushed[:, None] - levels), axis=1).max()
+            results.append((f"{bits}-bit levels, amplitude {amplitude}", float(off_level)))
+            results.append((f"{bits}-bit DC, amplitude {amplitude}", abs(float(np.mean(crushed, dtype=np.float64)))))
+        silence = np.zeros(frames, dtype=DEFAULT_DTYPE)
+        BitCrushStage(bits).process(silence, pool)
+        results.append((f"{bits}-bit silence", float(np.max(np.abs(silence)))))
+    return results
+
+
+def print_results(title, results):
+    print(title)
+    for name, seconds in results.items():
+        print(f"  {name:<28} {seconds * 1000:8.3f} ms")
+
+
+def print_aliasing(results):
+    print("Aliased energy (naive vs wavetable)")
+    for name, ratios in results.items():
+        # Clamped like the precision report, since rounding can leave a ratio at zero or just below
+        naive, table = 10 * np.log10(np.maximum(ratios, 1e-30))
+        print(f"  {name:<28} {naive:7.1f} dB  {table:7.1f} dB")
+
+
+def run_micro():
+    print_results("Low-pass filter, 1 s @ 44.1 kHz", bench_lowpass())
+    print_results(f"Oscillators, 1 s @ 44.1 kHz in {DEFAULT_BLOCK_SIZE}-frame blocks", bench_oscillators())
+    print_results("Oscillators, 1 s @ 44.1 kHz in one block", bench_oscillators(block_size=44100))
+    print_aliasing(bench_aliasing())
+    print_results(f"Voice bank, one {DEFAULT_BLOCK_SIZE}-frame block", bench_voice_bank())
+    print_results("Spectrogram", bench_spectrum())
+    print_results("Modulation matrix, 1 s with 13 sources on 14 routes", bench_modulation())
+    print_results("Parameter sweep, 64 variants", bench_sweep())
+    print("Bit crush and export, 5 minutes @ 44.1 kHz")
+    for name, (seconds, peak) in bench_bit_crush().items():
+        print(f"  {name:<32} {seconds * 1000:8.1f} ms, peak {peak / 1e6:6.1f} MB")
+    p50, p99, misses, published = bench_live()
+    print(f"Live preview, 3 s in {DEFAULT_BLOCK_SIZE}-frame blocks with {published} snapshots published\n"
+          f"  block p50 {p50 * 1000:.3f} ms, p99 {p99 * 1000:.3f} ms, {misses} missed deadlines")
+    elapsed, realtime_factor, peak, renders = bench_sequencer()
+    print(f"Sequencer, 10,000 notes over 5 minutes\n  {elapsed:.2f} s ({realtime_factor:.0f}x real time), "
+          f"{renders} note renders, peak {peak / 1e6:.1f} MB once the notes are cached")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the audio_utils generators and effects.")
+    parser.add_argument("--quick", action="store_true", help="smaller grid of durations and sample rates")
+    parser.add_argument("-o", "--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="flag cases slower than threshold x baseline (default: 1.25)")
+    parser.add_argument("--micro", action="store_true", help="run the focused comparisons instead of the suite")
+    parser.add_argument("--check-precision", action="store_true",
+                        help="compare float32 renders with the float64 reference instead of timing")
+    args = parser.parse_args(argv)
+
+    if args.micro:
+        run_micro()
+        return 0
+
+    if args.check_precision:
+        results = check_precision()
+        worst_patch, worst = max(results, key=lambda result: result[1])
+        print(f"Checked {len(results)} patches, worst float32 error {worst:.2e} "
+              f"({20 * np.log10(max(worst, 1e-12)):.1f} dBFS) for {worst_patch}")
+        batch = check_batch_generators()
+        print(f"Checked {len(batch)} batch generators, worst error {max(error for _, error in batch):.2e} "
+              f"against the per-voice generators")
+        crush = check_bit_crush()
+        print(f"Checked {len(crush)} bit crusher levels, DC offsets and silences, "
+              f"worst error {max(error for _, error in crush):.2e}")
+        failures = [result for result in results + batch + crush if result[1] > PRECISION_TOLERANCE]
+        for patch, error in failures:
+            print(f"OUT OF TOLERANCE {error:.2e}: {patch}")
+        return 1 if failures else 0
+
+    durations = QUICK_DURATIONS if args.quick else DURATIONS
+    sample_rates = QUICK_SAMPLE_RATES if args.quick else SAMPLE_RATES
+    results = run_suite(durations, sample_rates, progress=lambda result: print(format_result(result), flush=True))
+
+    if args.output:
+        save_results(args.output, results)
+        print(f"Saved {len(results)} results to {args.output}")
+
+    if args.baseline:
+        regressions = compare_results(results, args.baseline, args.threshold)
+        for result, ratio in regressions:
+            print(f"REGRESSION {ratio:.2f}x slower:{format_result(result)}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
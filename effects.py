@@ -0,0 +1,201 @@
+import numpy as np
+
+from audio_utils import DEFAULT_DTYPE, NoiseSource, design_lowpass, sosfilt
+from instrumentation import timed
+
+
+class BufferPool:
+    """Named scratch buffers that are reused between renders.
+
+    A buffer is only reallocated when a longer one is requested, so once the
+    longest render has been seen, getting a buffer allocates nothing.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, frames, dtype=DEFAULT_DTYPE):
+        key = (name, np.dtype(dtype))
+        buffer = self._buffers.get(key)
+        if buffer is None or len(buffer) < frames:
+            buffer = np.empty(frames, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer[:frames]
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+
+# ===== STAGES =====
+# Every stage processes a buffer in place and keeps its dtype: process(buffer, pool).
+# Stateful stages also have reset(), and carry their state from one buffer to the next,
+# so a render can be processed in consecutive blocks.
+class LowpassStage:
+    def __init__(self, cutoff=1000, sample_rate=44100, order=5):
+        self.cutoff = cutoff
+        self.sample_rate = sample_rate
+        self.order = order
+        self.sos = design_lowpass(cutoff, sample_rate, order)
+        self.reset()
+
+    def reset(self):
+        self.zi = np.zeros((self.sos.shape[0], 2))
+
+    def process(self, buffer, pool):
+        # sosfilt has no out= argument (and runs in float64), so this is the one stage with a temporary
+        buffer[:], self.zi = sosfilt(self.sos, buffer, zi=self.zi)
+
+
+class DistortionStage:
+    """Soft-clipping distortion, same curve as audio_utils.apply_distortion."""
+
+    def __init__(self, gain=5.0, mix=0.5):
+        self.gain = gain
+        self.mix = mix
+
+    def process(self, buffer, pool):
+        # output = (1 - mix) * x + mix * tanh(gain * x) = x + mix * (tanh(gain * x) - x)
+        distorted = pool.get("distortion", len(buffer), buffer.dtype)
+        np.multiply(buffer, self.gain, out=distorted)
+        np.tanh(distorted, out=distorted)
+        distorted -= buffer
+        distorted *= self.mix
+        buffer += distorted
+
+
+class NoiseStage:
+    """Mixes seeded noise into the signal; mix=1 replaces the signal with noise."""
+
+    def __init__(self, amplitude, color="white", mix=1.0, seed=None):
+        self.source = NoiseSource(color, amplitude, seed)
+        self.mix = mix
+
+    def reset(self):
+        self.source.reset()  # Every render gets the same stream for the same seed
+
+    def process(self, buffer, pool):
+        noise = self.source.process(len(buffer), out=pool.get("noise", len(buffer), buffer.dtype))
+        if self.mix != 1:
+            noise *= self.mix
+            buffer *= 1 - self.mix
+            buffer += noise
+        else:
+            buffer[:] = noise
+
+
+CRUSH_BLOCK = 16384  # Samples quantized at a time by BitCrushStage
+
+
+class BitCrushStage:
+    """Quantizes the signal to `bits` levels and holds every sample for `downsample` samples.
+
+    The quantizer is mid-rise: the 2**bits output levels are +-(k + 1/2) /
+    2**(bits - 1), symmetric around zero, so even 1 and 2 bits stay bipolar
+    without DC. Exact zeros (silence) stay zero. The levels are exact PCM
+    levels one bit deeper, so exporting at a higher bit depth is lossless.
+    With `dither`, seeded TPDF noise of +-1 step is added before quantizing.
+    The hold carries over between buffers.
+    """
+
+    def __init__(self, bits=8, downsample=1, dither=False, seed=None):
+        if not 1 <= bits <= 24:
+            raise ValueError(f"Bit depth must be between 1 and 24, not {bits}")
+        if downsample < 1:
+            raise ValueError(f"Downsample factor must be at least 1, not {downsample}")
+        self.bits = bits
+        self.downsample = int(downsample)
+        self.dither = dither
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        self.rng = np.random.default_rng(self.seed)
+        self._hold_position = 0  # Samples into the current hold when the next buffer starts
+        self._held = 0.0
+
+    def process(self, buffer, pool):
+        # Cache-sized pieces, so the quantizing steps below reread the samples from cache, not memory
+        for start in range(0, len(buffer), CRUSH_BLOCK):
+            self._quantize(buffer[start:start + CRUSH_BLOCK], pool)
+        if self.downsample > 1:
+            self._hold(buffer)
+
+    def _quantize(self, buffer, pool):
+        half = 2 ** (self.bits - 1)
+        buffer *= half
+        if self.dither:
+            # Difference of two uniform values per sample, drawn as consecutive pairs from one
+            # call so the stream does not depend on how a render is split into buffers
+            noise = pool.get("dither", 2 * len(buffer), buffer.dtype)
+            self.rng.random(out=noise, dtype=noise.dtype)
+            buffer += noise[0::2]
+            buffer -= noise[1::2]
+        # Mid-rise on the magnitude, so the levels mirror around zero; sign() keeps silence at zero
+        # Without a pool (render_sweep's undithered 2-D batches) the signs get a temporary array
+        sign = np.sign(buffer) if pool is None else np.sign(buffer, out=pool.get("sign", len(buffer), buffer.dtype))
+        np.abs(buffer, out=buffer)
+        np.floor(buffer, out=buffer)
+        np.minimum(buffer, half - 1, out=buffer)
+        buffer += 0.5
+        buffer *= sign
+        buffer /= half
+
+    def _hold(self, buffer):
+        factor = self.downsample
+        # Finish the hold that the previous buffer started
+        head = min((factor - self._hold_position) % factor, len(buffer))
+        buffer[:head] = self._held
+        body = buffer[head:]
+        full = len(body) // factor * factor
+        held = body[:full].reshape(-1, factor)
+        held[:, 1:] = held[:, :1]
+        tail = body[full:]
+        if len(tail):
+            tail[:] = tail[0]
+            self._held = tail[0]
+        self._hold_position = (self._hold_position + len(buffer)) % factor
+
+
+class EffectsChain:
+    """Ordered list of in-place stages sharing one buffer pool."""
+
+    def __init__(self, stages, pool=None):
+        self.stages = list(stages)
+        self.pool = pool if pool is not None else BufferPool()
+
+    @timed("effects")
+    def process(self, buffer):
+        """Process a whole render, starting every stage from a clean state."""
+        self.reset()
+        return self.process_block(buffer)
+
+    def reset(self):
+        for stage in self.stages:
+            if hasattr(stage, "reset"):
+                stage.reset()
+
+    def process_block(self, buffer):
+        """Process the next block of a render, continuing from the previous block."""
+        for stage in self.stages:
+            stage.process(buffer, self.pool)
+        return buffer
+
+    @classmethod
+    def from_patch(cls, patch, pool=None):
+        """Build the app's effect order from a patch's effect flags.
+
+        Vibrato is not an effect stage: it modulates the oscillator's pitch
+        (see PatchRenderer).
+        """
+        sample_rate = patch["sample_rate"]
+        stages = []
+        if patch["lowpass"]:
+            stages.append(LowpassStage(patch["cutoff"], sample_rate))
+        if patch["distortion"]:
+            stages.append(DistortionStage())
+        if patch["noise"]:
+            stages.append(NoiseStage(patch["amplitude"], patch["noise_color"], patch["noise_mix"], patch["noise_seed"]))
+        if patch["bit_crush"]:
+            stages.append(BitCrushStage(patch["bit_depth"], patch["downsample"], patch["dither"], patch["noise_seed"]))
+        return cls(stages, pool)
@@ -0,0 +1,135 @@
+import itertools
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from instrumentation import timed
+
+# Display name -> (soundfile format, subtype, file extension)
+EXPORT_FORMATS = {
+    "WAV 16-bit": ("WAV", "PCM_16", "wav"),
+    "WAV 24-bit": ("WAV", "PCM_24", "wav"),
+    "WAV 8-bit": ("WAV", "PCM_U8", "wav"),
+    "WAV 32-bit float": ("WAV", "FLOAT", "wav"),
+    "FLAC 16-bit": ("FLAC", "PCM_16", "flac"),
+    "FLAC 24-bit": ("FLAC", "PCM_24", "flac"),
+}
+PCM_BITS = {"PCM_S8": 8, "PCM_U8": 8, "PCM_16": 16, "PCM_24": 24}
+
+
+def to_pcm(samples, bits, out=None, scratch=None):
+    """Float samples in [-1, 1) to `bits`-bit PCM levels, in the integer container soundfile writes from.
+
+    Up to 16 bits the container is int16, above that int32; the levels are
+    left-aligned in it (8-bit level k is k * 256), which is what libsndfile
+    expects. A sample on an exact level, such as the output of
+    BitCrushStage at a lower bit depth, is written unchanged. `out` and
+    `scratch` (same dtype as `samples`) can be reused between chunks.
+    """
+    container = np.int16 if bits <= 16 else np.int32
+    output = np.empty(len(samples), dtype=container) if out is None else out[:len(samples)]
+    scaled = np.empty_like(samples) if scratch is None else scratch[:len(samples)]
+    half = 2 ** (bits - 1)
+    np.multiply(samples, half, out=scaled)
+    np.rint(scaled, out=scaled)
+    np.clip(scaled, -half, half - 1, out=scaled)
+    output[:] = scaled
+    shift = 8 * output.itemsize - bits
+    if shift:
+        output <<= shift
+    return output
+
+
+@timed("export write")
+def write_audio(audio, path, sample_rate, file_format="WAV", subtype="PCM_16", chunk_frames=65536):
+    """Stream `audio` (an array or an iterable of blocks) into a mono sound file.
+
+    Arrays are written chunk by chunk from views. PCM subtypes are converted
+    with to_pcm through two chunk-sized buffers, so no intermediate array of
+    the whole render is made and the levels are exact.
+    """
+    import soundfile as sf  # Imported on first write, so it never delays app start-up
+    chunks = audio if not isinstance(audio, np.ndarray) else (
+        audio[start:start + chunk_frames] for start in range(0, len(audio), chunk_frames))
+    bits = PCM_BITS.get(subtype)
+    pcm = scratch = None
+    with sf.SoundFile(path, "w", samplerate=sample_rate, channels=1, format=file_format, subtype=subtype) as f:
+        for chunk in chunks:
+            if bits is None:
+                f.write(chunk)
+                continue
+            if pcm is None or len(pcm) < len(chunk) or scratch.dtype != chunk.dtype:
+                pcm = np.empty(len(chunk), dtype=np.int16 if bits <= 16 else np.int32)
+                scratch = np.empty(len(chunk), dtype=chunk.dtype)
+            f.write(to_pcm(chunk, bits, pcm, scratch))
+
+
+class ExportService:
+    """Writes audio files on a background thread so callers never wait on disk I/O.
+
+    `export` only queues a job and returns the path the file will get. The
+    writer thread opens a SoundFile and streams the audio into it chunk by
+    chunk, straight from the caller's buffer (or from an iterable of blocks),
+    so a long render is never copied as a whole. The job queue is bounded:
+    when it is full the export is refused instead of blocking the caller.
+    """
+
+    def __init__(self, directory="exports", prefix="generated_audio", export_format="WAV 16-bit",
+                 max_pending=8, chunk_frames=65536, on_complete=None):
+        self.directory = directory
+        self.prefix = prefix
+        self.export_format = export_format
+        self.chunk_frames = chunk_frames
+        self.on_complete = on_complete  # Called from the writer thread with (path, error or None)
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._counter = itertools.count(1)
+        self._thread = threading.Thread(target=self._run, name="audio-export", daemon=True)
+        self._thread.start()
+
+    def unique_path(self, extension):
+        """New file name: prefix, timestamp and a per-session counter."""
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        while True:
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{next(self._counter):03d}.{extension}")
+            if not os.path.exists(path):
+                return path
+
+    def export(self, audio, sample_rate, export_format=None):
+        """Queue `audio` (an array or an iterable of blocks) for writing.
+
+        Returns the output path, or None if too many exports are pending.
+        The array must not be modified until the write has finished.
+        """
+        file_format, subtype, extension = EXPORT_FORMATS[export_format or self.export_format]
+        path = self.unique_path(extension)
+        try:
+            self._jobs.put_nowait((audio, path, sample_rate, file_format, subtype))
+        except queue.Full:
+            return None
+        return path
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            path = job[1]
+            error = None
+            try:
+                self._write(*job)
+            except Exception as exc:  # Report to the caller instead of killing the thread
+                error = exc
+            if self.on_complete is not None:
+                self.on_complete(path, error)
+
+    def _write(self, audio, path, sample_rate, file_format, subtype):
+        write_audio(audio, path, sample_rate, file_format, subtype, self.chunk_frames)
+
+    def close(self, timeout=None):
+        """Finish the queued exports and stop the writer thread."""
+        self._jobs.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,142 @@
+"""Per-stage timing for the synth, switched on with the CUTE_SYNTH_PROFILE environment variable.
+
+    CUTE_SYNTH_PROFILE=1 python main.py
+
+Functions decorated with `timed` record their wall-clock duration into a
+fixed-size ring buffer per stage. When profiling is off, `timed` returns the
+function unchanged, so the instrumented code runs exactly as before.
+
+Start-up timing is separate: with CUTE_SYNTH_STARTUP=1 the app prints how
+long imports, the first paint and the first waveform took, then quits. Set
+CUTE_SYNTH_STARTUP_BUDGET to a number of seconds to make it exit with
+status 1 when the first paint is slower than that.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+_PROCESS_START = time.perf_counter()  # Close enough: main.py imports this module first
+
+import numpy as np
+
+ENABLED = os.environ.get("CUTE_SYNTH_PROFILE", "") not in ("", "0")
+LOG_PATH = os.environ.get("CUTE_SYNTH_PROFILE_LOG", "profile.jsonl")
+STARTUP_TIMING = os.environ.get("CUTE_SYNTH_STARTUP", "") not in ("", "0")
+STARTUP_BUDGET = float(os.environ.get("CUTE_SYNTH_STARTUP_BUDGET", "0") or 0)  # Seconds to first paint, 0 = none
+
+
+class StageStats:
+    """Ring buffer of the most recent durations (and rendered audio lengths) of one stage."""
+
+    def __init__(self, capacity=1024):
+        self.durations = np.zeros(capacity)
+        self.audio_seconds = np.full(capacity, np.nan)
+        self.count = 0
+
+    def record(self, seconds, audio_seconds=None):
+        index = self.count % len(self.durations)
+        self.durations[index] = seconds
+        self.audio_seconds[index] = np.nan if audio_seconds is None else audio_seconds
+        self.count += 1
+
+    def summary(self):
+        filled = min(self.count, len(self.durations))
+        durations = self.durations[:filled]
+        p50, p99 = np.percentile(durations, [50, 99])
+        summary = {"count": self.count, "p50_ms": p50 * 1000, "p99_ms": p99 * 1000}
+        audio = self.audio_seconds[:filled]
+        has_audio = ~np.isnan(audio)
+        if has_audio.any():
+            # Seconds of audio produced per second of compute
+            summary["realtime_factor"] = float(np.median(audio[has_audio] / durations[has_audio]))
+        return summary
+
+
+class Profiler:
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, audio_seconds=None):
+        stats = self.stages.get(stage)
+        if stats is None:
+            with self._lock:
+                stats = self.stages.setdefault(stage, StageStats())
+        stats.record(seconds, audio_seconds)
+
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    def summary(self):
+        summary = {stage: stats.summary() for stage, stats in list(self.stages.items()) if stats.count}
+        return {"stages": summary, "counters": dict(self.counters)}
+
+    def status_text(self, stages=None):
+        """One-line p50/p99 summary for a status bar."""
+        summary = self.summary()
+        parts = []
+        for stage, stats in summary["stages"].items():
+            if stages is None or stage in stages:
+                parts.append(f"{stage} {stats['p50_ms']:.1f}/{stats['p99_ms']:.1f} ms")
+        parts += [f"{name} {value}" for name, value in summary["counters"].items()]
+        return " | ".join(parts)
+
+    def dump(self, path=LOG_PATH):
+        """Append the current summary as one JSON line to a log file."""
+        with open(path, "a") as f:
+            f.write(json.dumps({"time": time.time(), **self.summary()}) + "\n")
+
+
+PROFILER = Profiler()
+
+
+class StartupTimer:
+    """Named start-up milestones, in seconds since this module was imported."""
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = {}
+
+    def mark(self, name):
+        """Record a milestone; only its first occurrence counts."""
+        self.marks.setdefault(name, time.perf_counter() - self.start)
+
+    def report(self):
+        lines = []
+        previous = 0.0
+        for name, seconds in self.marks.items():
+            lines.append(f"{name:<28} {seconds * 1000:8.1f} ms  (+{(seconds - previous) * 1000:.1f})")
+            previous = seconds
+        return "\n".join(lines)
+
+
+STARTUP = StartupTimer(_PROCESS_START)
+
+
+def returned_duration(result):
+    """audio_seconds extractor for functions returning (waveform, sample_rate, duration)."""
+    return result[2]
+
+
+def timed(stage, audio_seconds=None):
+    """Decorator that records each call's duration under `stage` while profiling is enabled.
+
+    `audio_seconds` optionally maps the return value to the length of audio
+    produced, which adds a real-time factor to the stage's summary.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            PROFILER.record(stage, elapsed, audio_seconds(result) if audio_seconds else None)
+            return result
+        return wrapper
+    return decorate
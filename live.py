@@ -0,0 +1,166 @@
+"""Live preview: the GUI's parameters played continuously by the audio callback.
+
+    parameters = ParameterMailbox(patch)
+    voice = LiveVoice(parameters)
+    engine.play(voice)
+    parameters.publish({**patch, "frequency": 220})  # from the GUI thread, at any rate
+
+The GUI thread publishes every change as an immutable snapshot. The audio
+callback picks up the newest snapshot once per block, without locks, and
+moves each parameter toward it with per-block smoothing, so slider drags
+glide instead of stepping (no zipper noise) and effect switches crossfade
+instead of clicking.
+"""
+import math
+from types import MappingProxyType
+
+import numpy as np
+
+from audio_utils import DEFAULT_DTYPE, LowpassFilter, NoiseSource, accumulate_phase, segment_ramp
+from effects import BitCrushStage, BufferPool
+from modulation import CUTOFF_STEPS_PER_OCTAVE, MIN_CUTOFF, VIBRATO_DEPTH, VIBRATO_RATE
+from rendering import WAVEFORMS, full_patch
+from wavetables import build_mipmap, octave_for, table_lookup
+
+SMOOTHING_TIME = 0.02  # Seconds for a parameter to cover about 63 % of a change
+SETTLED = 1e-4  # Distance to the target below which a parameter snaps to it
+SWITCHES = ("lowpass", "distortion", "noise", "vibrato", "bit_crush")  # Effects that crossfade in and out
+
+
+class ParameterMailbox:
+    """Latest-value handoff of parameter snapshots from one producer thread to the audio callback.
+
+    `publish` swaps in a new read-only snapshot with a single reference
+    assignment, which is atomic in CPython; `latest` is read once per block.
+    Neither side locks or waits: a snapshot the callback never got to see is
+    simply replaced by the next one.
+    """
+
+    def __init__(self, patch=None):
+        self._latest = (0, MappingProxyType(full_patch(patch or {})))
+
+    def publish(self, patch):
+        """Make `patch` (a dict of DEFAULT_PATCH keys) the current parameters. Producer thread only."""
+        version = self._latest[0] + 1
+        self._latest = (version, MappingProxyType(full_patch(patch)))
+        return version
+
+    @property
+    def latest(self):
+        """(version, snapshot) of the newest published parameters."""
+        return self._latest
+
+
+class Smoother:
+    """One parameter moving exponentially toward its target, as a linear ramp within each block.
+
+    `ramp` returns a plain float once the parameter has settled, so settled
+    parameters cost nothing per sample.
+    """
+
+    def __init__(self, value, sample_rate=44100, time_constant=SMOOTHING_TIME, dtype=DEFAULT_DTYPE):
+        self.value = float(value)
+        self.sample_rate = sample_rate
+        self.time_constant = time_constant
+        self.dtype = np.dtype(dtype)
+
+    def ramp(self, target, frames):
+        start = self.value
+        if abs(target - start) <= SETTLED * max(abs(target), 1.0):
+            self.value = float(target)
+            return self.value
+        self.value = target + (start - target) * math.exp(-frames / (self.time_constant * self.sample_rate))
+        # 0 -> 1 over frames + 1 points, without the first, so the block ends exactly on the new value
+        return start + (self.value - start) * segment_ramp(frames + 1, self.dtype)[1:]
+
+
+class LiveVoice:
+    """Block source that plays the newest snapshot of a ParameterMailbox without an envelope.
+
+    Frequency and cutoff glide in octaves, amplitude and the noise mix
+    glide linearly, and waveforms and effects crossfade. `stop` fades the
+    voice out; `finished` then turns true, so AudioEngine drops it.
+    """
+
+    def __init__(self, parameters, sample_rate=44100, dtype=DEFAULT_DTYPE):
+        self.parameters = parameters
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.version, patch = parameters.latest
+        self.levels = {shape: build_mipmap(shape, sample_rate, dtype=self.dtype) for shape in WAVEFORMS}
+        self.phase = 0.0
+        self.vibrato_phase = 0.0
+        self.stopping = False
+
+        def smoother(value, dtype=self.dtype):
+            return Smoother(value, sample_rate, dtype=dtype)
+
+        # Pitch stays float64 because the phase integrates it
+        self.pitch = smoother(math.log2(patch["frequency"]), np.float64)
+        self.cutoff = smoother(math.log2(patch["cutoff"]))
+        self.amplitude = smoother(0.0)  # Fades in from silence
+        self.noise_mix = smoother(patch["noise_mix"])
+        self.shapes = {shape: smoother(shape == patch["waveform"]) for shape in WAVEFORMS}
+        self.switches = {name: smoother(patch[name]) for name in SWITCHES}
+        self.filter = LowpassFilter(patch["cutoff"], sample_rate, dtype=self.dtype)
+        self.noise = NoiseSource(patch["noise_color"], 1.0, patch["noise_seed"], self.dtype)
+        self.crusher = BitCrushStage(patch["bit_depth"])
+        self.pool = BufferPool()
+
+    @property
+    def finished(self):
+        return self.stopping and self.amplitude.value == 0
+
+    def stop(self):
+        """Fade out; safe to call from any thread."""
+        self.stopping = True
+
+    def process(self, frames):
+        self.version, patch = self.parameters.latest  # The one read of the GUI's state for this block
+        amplitude = self.amplitude.ramp(0.0 if self.stopping else patch["amplitude"], frames)
+
+        # Oscillator: the pitch glide and the vibrato are integrated into the phase
+        pitch = self.pitch.ramp(math.log2(patch["frequency"]), frames)
+        vibrato = self.switches["vibrato"].ramp(patch["vibrato"], frames)
+        if not np.isscalar(vibrato) or vibrato:
+            increment = VIBRATO_RATE / self.sample_rate
+            lfo = np.sin(2 * np.pi * (self.vibrato_phase + increment * np.arange(frames)))
+            self.vibrato_phase = (self.vibrato_phase + increment * frames) % 1.0
+            pitch = pitch + vibrato * VIBRATO_DEPTH / 12 * lfo
+        frequency = np.exp2(pitch)
+        phase, self.phase = accumulate_phase(self.phase, np.broadcast_to(frequency / self.sample_rate, frames))
+        octave = int(octave_for(np.max(frequency)))
+        block = np.zeros(frames, dtype=self.dtype)
+        for shape, weight in self.shapes.items():
+            weight = weight.ramp(shape == patch["waveform"], frames)
+            if not np.isscalar(weight) or weight:
+                block += weight * table_lookup(self.levels[shape], octave, phase)
+        block *= amplitude
+
+        # Effects, in the order of EffectsChain.from_patch, each blended in by its switch
+        wet = self.switches["lowpass"].ramp(patch["lowpass"], frames)
+        cutoff = self.cutoff.ramp(math.log2(patch["cutoff"]), frames)
+        if not np.isscalar(wet) or wet:
+            # One design per block, rounded so the designs stay cached while the cutoff glides
+            octaves = np.round(np.max(cutoff) * CUTOFF_STEPS_PER_OCTAVE) / CUTOFF_STEPS_PER_OCTAVE
+            self.filter.set_cutoff(float(np.clip(2 ** octaves, MIN_CUTOFF, 0.45 * self.sample_rate)))
+            block += wet * (self.filter.process(block) - block)
+        wet = self.switches["distortion"].ramp(patch["distortion"], frames)
+        if not np.isscalar(wet) or wet:
+            block += 0.5 * wet * (np.tanh(5.0 * block) - block)
+        wet = self.switches["noise"].ramp(patch["noise"], frames) * self.noise_mix.ramp(patch["noise_mix"], frames)
+        if not np.isscalar(wet) or wet:
+            if self.noise.color != patch["noise_color"]:
+                self.noise = NoiseSource(patch["noise_color"], 1.0, patch["noise_seed"], self.dtype)
+            noise = self.noise.process(frames, out=self.pool.get("noise", frames, self.dtype))
+            noise *= amplitude
+            block += wet * (noise - block)
+        wet = self.switches["bit_crush"].ramp(patch["bit_crush"], frames)
+        if not np.isscalar(wet) or wet:
+            if self.crusher.bits != patch["bit_depth"]:
+                self.crusher = BitCrushStage(patch["bit_depth"])
+            crushed = self.pool.get("crushed", frames, self.dtype)
+            crushed[:] = block
+            self.crusher.process(crushed, self.pool)
+            block += wet * (crushed - block)
+        return block
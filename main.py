@@ -1,81 +1,63 @@
 import sys
-import numpy as np
-import sounddevice as sd
-import soundfile as sf
+import threading
 
-import os
-os.environ["QT_API"] = "PyQt6"  # Force Matplotlib to use PyQt6
+from instrumentation import ENABLED as PROFILING_ENABLED, PROFILER, STARTUP, STARTUP_BUDGET, STARTUP_TIMING, timed
 
-import matplotlib
-matplotlib.use("QtAgg")  # Ensure it's using the correct Qt backend
-
-
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from PyQt6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QSlider, QPushButton, QLabel, QCheckBox, QSizePolicy
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QSlider, QPushButton, QLabel, QCheckBox, QComboBox
+from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QIcon, QFont, QFontDatabase
-from audio_utils import generate_sine_wave, apply_lowpass_filter, generate_square_wave, generate_sawtooth_wave, generate_noise, apply_distortion, generate_vibrato, convert_to_bit_depth
-
-# Matplotlib Canvas for embedding in PyQt
-class WaveformCanvas(FigureCanvas):
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes = self.fig.add_subplot(111)
-        super(WaveformCanvas, self).__init__(self.fig)
-        self.setParent(parent)
-        
-        # Make the canvas expandable
-        FigureCanvas.setSizePolicy(self,
-                                  QSizePolicy.Policy.Expanding,
-                                  QSizePolicy.Policy.Expanding)
-        FigureCanvas.updateGeometry(self)
-        
-        # Load the "Sour Gummy" font
-        font_path = "SourGummy-VariableFont_wdth,wght.ttf" 
-        self.sour_gummy_font = fm.FontProperties(fname=font_path)
-        
-    def plot_waveform(self, waveform, sr, duration, title="Waveform"):
-        """Update the plot with new waveform data"""
-        self.axes.clear()
-        time_axis = np.linspace(0, duration, len(waveform))
-        self.axes.plot(time_axis, waveform, color="#E53888", linewidth=2)  
-        
-         # Clone the font properties and set size dynamically
-        font_title = self.sour_gummy_font.copy()
-        font_title.set_size(16)
-
-        font_labels = self.sour_gummy_font.copy()
-        font_labels.set_size(12)
-        
-         # Change background colors
-        self.fig.patch.set_facecolor("#F7A8C4")  # Outside figure background 
-        self.axes.set_facecolor("#fff0f5")  # Light pink background
-        
-        # Set pink title and labels
-        self.axes.set_title(title, color="#AC1754", fontsize=14, fontproperties=font_title)  
-        self.axes.set_xlabel("Time (seconds)", color="#AC1754", fontsize=12, fontproperties=font_labels)
-        self.axes.set_ylabel("Amplitude", color="#AC1754", fontsize=12, fontproperties=font_labels)
-
-        # Set tick colors to pink
-        self.axes.tick_params(axis="x", colors="#AC1754")
-        self.axes.tick_params(axis="y", colors="#AC1754")
-        
-        # Set font for tick labels
-        for label in self.axes.get_xticklabels():
-            label.set_fontproperties(self.sour_gummy_font)
-        for label in self.axes.get_yticklabels():
-            label.set_fontproperties(self.sour_gummy_font)
-
-        self.axes.grid(True)
-        self.fig.tight_layout()        
-        self.draw()
+from export import EXPORT_FORMATS, ExportService
+STARTUP.mark("Qt imported")
+
+# Heavy modules (matplotlib, scipy.signal, sounddevice) are imported in
+# AudioApp.finish_startup, after the window has been painted.
+
+FONT_PATH = "SourGummy-VariableFont_wdth,wght.ttf"
+
+# Background render thread
+class RenderWorker(QThread):
+    """Renders patches off the GUI thread with a latest-wins policy.
+
+    Only one request is kept pending: submitting a new one replaces any
+    request that has not started yet, so a slider drag never queues a
+    backlog of stale renders.
+    """
+    rendered = pyqtSignal(int, object, object)  # request id, patch, (waveform, sr, duration)
+
+    def __init__(self, render_cache, parent=None):
+        super().__init__(parent)
+        self.render_cache = render_cache
+        self._condition = threading.Condition()
+        self._pending = None
+        self._running = True
+
+    def submit(self, request_id, patch):
+        with self._condition:
+            self._pending = (request_id, patch)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and self._running:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                request_id, patch = self._pending
+                self._pending = None
+            self.rendered.emit(request_id, patch, self.render_cache.get_or_render(patch))
 
 
 # GUI Class
 class AudioApp(QMainWindow):
+    export_finished = pyqtSignal(str, object)  # path, error or None; emitted from the writer thread
+
     def __init__(self):
         super().__init__()
 
@@ -83,7 +65,8 @@ class AudioApp(QMainWindow):
         self.setWindowIcon(QIcon("cute_icon.png"))
         self.setGeometry(100, 100, 800, 600)  # Increased size to accommodate waveform
         
-        font_id = QFontDatabase.addApplicationFont("SourGummy-VariableFont_wdth,wght.ttf")
+        # Qt loads the font file here; the plot's matplotlib copy is loaded with the canvas, after first paint
+        font_id = QFontDatabase.addApplicationFont(FONT_PATH)
         if font_id != -1:
             font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
             cute_font = QFont(font_family, 12)
@@ -147,9 +130,25 @@ class AudioApp(QMainWindow):
         self.frequency = 440
         self.amplitude = 0.5
         self.cutoff = 1000  # Default low-pass cutoff
+        self.bit_depth = 8  # Bit crusher depth
         self.duration = 1.0  # Default duration in seconds
         self.current_waveform_type = "sine"  # Track current waveform type
 
+        # Render cache, render worker, audio engine and plot are created in
+        # finish_startup, once the window is on screen
+        self.render_cache = None
+        self.render_request_id = 0
+        self.render_worker = None
+        self.parameters = None  # ParameterMailbox read by the live preview in the audio callback
+        self.live_voice = None
+        self.engine = None
+        self.waveform_canvas = None
+        self._startup_scheduled = False
+
+        # Files are written on a background thread so playback never waits on disk
+        self.export_finished.connect(self.on_export_finished)
+        self.exporter = ExportService(on_complete=self.export_finished.emit)
+
         # Main widget and layout
         self.main_widget = QWidget()
         self.setCentralWidget(self.main_widget)
@@ -161,12 +160,14 @@ class AudioApp(QMainWindow):
         self.controls_layout = QVBoxLayout()
         self.controls_widget.setLayout(self.controls_layout)
         
-        # Right panel for waveform
-        self.waveform_canvas = WaveformCanvas(self.main_widget)
+        # Right panel for waveform, a placeholder until the plot is ready
+        self.waveform_placeholder = QLabel("Warming up the synth...")
+        self.waveform_placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
         
         # Add both panels to main layout
         self.main_layout.addWidget(self.controls_widget, 1)  # Controls take 1 part
-        self.main_layout.addWidget(self.waveform_canvas, 2)  # Waveform takes 2 parts
+        self.main_layout.addWidget(self.waveform_placeholder, 2)  # Waveform takes 2 parts
+        self.controls_widget.setEnabled(False)
 
         # ===== CONTROLS =====
         # Frequency Slider
@@ -242,10 +243,18 @@ class AudioApp(QMainWindow):
         self.release_slider.valueChanged.connect(self.update_release)
         self.controls_layout.addWidget(self.release_slider)
 
-        # Checkbox for 8-bit conversion
-        self.bit_depth_checkbox = QCheckBox("Convert to 8-bit")
+        # Checkbox and depth slider for the bit crusher
+        self.bit_depth_checkbox = QCheckBox("Apply bit crusher")
         self.bit_depth_checkbox.stateChanged.connect(self.update_waveform)
         self.controls_layout.addWidget(self.bit_depth_checkbox)
+        self.bit_depth_label = QLabel(f"Bit depth: {self.bit_depth}")
+        self.controls_layout.addWidget(self.bit_depth_label)
+        self.bit_depth_slider = QSlider(Qt.Orientation.Horizontal)
+        self.bit_depth_slider.setMinimum(1)
+        self.bit_depth_slider.setMaximum(24)
+        self.bit_depth_slider.setValue(self.bit_depth)
+        self.bit_depth_slider.valueChanged.connect(self.update_bit_depth)
+        self.controls_layout.addWidget(self.bit_depth_slider)
         
         # Checkbox for lowpass filter
         self.lowpass_checkbox = QCheckBox("Apply lowpass filter")
@@ -267,6 +276,11 @@ class AudioApp(QMainWindow):
         self.distortion_checkbox.stateChanged.connect(self.update_waveform)
         self.controls_layout.addWidget(self.distortion_checkbox)
 
+        # Checkbox for the live preview: the audio callback plays the controls' current settings
+        self.live_checkbox = QCheckBox("Live preview")
+        self.live_checkbox.stateChanged.connect(self.toggle_live_preview)
+        self.controls_layout.addWidget(self.live_checkbox)
+
         # Play square Button
         self.play_square_button = QPushButton("Play Square Sound")
         self.play_square_button.clicked.connect(self.play_square_sound)
@@ -281,10 +295,89 @@ class AudioApp(QMainWindow):
         self.play_sawtooth_button = QPushButton("Play Saw Tooth Sound")
         self.play_sawtooth_button.clicked.connect(self.play_sawtooth_sound)
         self.controls_layout.addWidget(self.play_sawtooth_button)
-        
+
+        # Export format selector
+        self.export_format_label = QLabel("Export format:")
+        self.controls_layout.addWidget(self.export_format_label)
+        self.export_format_combo = QComboBox()
+        self.export_format_combo.addItems(EXPORT_FORMATS)
+        self.controls_layout.addWidget(self.export_format_combo)
+        
+        # Stage timings in the status bar, only when profiling is switched on
+        if PROFILING_ENABLED:
+            self.profile_label = QLabel()
+            self.statusBar().addPermanentWidget(self.profile_label)
+            self.profile_timer = QTimer(self)
+            self.profile_timer.timeout.connect(self.show_profile)
+            self.profile_timer.start(500)
+
+        STARTUP.mark("window built")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._startup_scheduled:
+            STARTUP.mark("first paint")
+            self._startup_scheduled = True
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Import the heavy modules, start rendering and audio, and draw the first waveform."""
+        from rendering import RenderCache  # scipy.signal
+        STARTUP.mark("renderer imported")
+        from audio_engine import AudioEngine  # sounddevice
+        STARTUP.mark("audio engine imported")
+        from waveform_view import WaveformCanvas  # matplotlib
+        STARTUP.mark("plot imported")
+        from live import ParameterMailbox
+
+        # Renders shared by the preview and playback
+        self.render_cache = RenderCache()
+
+        # Background render thread for the waveform preview
+        self.render_worker = RenderWorker(self.render_cache)
+        self.render_worker.rendered.connect(self.on_waveform_rendered)
+        self.render_worker.start()
+
+        # Output stream stays open; play_* methods just hand it a new source
+        self.engine = AudioEngine()
+        self.engine.start()
+        self.parameters = ParameterMailbox(self.current_patch())
+
+        self.waveform_canvas = WaveformCanvas(self.main_widget, font_path=FONT_PATH)
+        self.main_layout.replaceWidget(self.waveform_placeholder, self.waveform_canvas)
+        self.waveform_placeholder.deleteLater()
+        self.controls_widget.setEnabled(True)
+        STARTUP.mark("ready")
+
         # Initial waveform display
         self.update_waveform()
 
+    def finish_startup_timing(self):
+        """Start-up timing mode: report the milestones and quit, failing if over budget."""
+        print(STARTUP.report())
+        first_paint = STARTUP.marks["first paint"]
+        over_budget = STARTUP_BUDGET and first_paint > STARTUP_BUDGET
+        if over_budget:
+            print(f"First paint took {first_paint:.3f} s, over the {STARTUP_BUDGET:.3f} s budget")
+        self.close()
+        QApplication.instance().exit(1 if over_budget else 0)
+
+    def closeEvent(self, event):
+        if self.render_worker is not None:
+            self.render_worker.stop()
+        if self.engine is not None:
+            self.engine.close()
+        self.exporter.close()
+        if PROFILING_ENABLED:
+            PROFILER.dump()
+        super().closeEvent(event)
+
+    def show_profile(self):
+        """Refresh the p50/p99 stage timings (GUI-facing stages only, to keep it short)."""
+        if self.engine is not None:
+            PROFILER.set_counter("underruns", self.engine.underruns)
+        self.profile_label.setText(PROFILER.status_text(("render", "plot", "audio callback", "export write")))
+
     # ===== UPDATE FUNCTIONS =====
     def update_frequency(self, value):
         self.frequency = value
@@ -321,187 +414,107 @@ class AudioApp(QMainWindow):
         self.release_label.setText(f"Release: {self.release} s")
         self.update_waveform()
     
+    def update_bit_depth(self, value):
+        self.bit_depth = value
+        self.bit_depth_label.setText(f"Bit depth: {self.bit_depth}")
+        self.update_waveform()
+
     # ===== MAIN WAVEFORM UPDATE FUNCTION =====
+    def current_patch(self):
+        """Snapshot of every parameter that affects the rendered sound."""
+        return {
+            "waveform": self.current_waveform_type,
+            "frequency": self.frequency,
+            "amplitude": self.amplitude,
+            "attack": self.attack,
+            "decay": self.decay,
+            "sustain": self.sustain,
+            "release": self.release,
+            "cutoff": self.cutoff,
+            "lowpass": self.lowpass_checkbox.isChecked(),
+            "distortion": self.distortion_checkbox.isChecked(),
+            "noise": self.noise_checkbox.isChecked(),
+            "vibrato": self.vibrato_checkbox.isChecked(),
+            "bit_crush": self.bit_depth_checkbox.isChecked(),
+            "bit_depth": self.bit_depth,
+        }
+
+    @timed("update_waveform")
     def update_waveform(self):
-        # Generate waveform based on current type
-        if self.current_waveform_type == "sine":
-            waveform, sr, total_duration = generate_sine_wave(
-                self.frequency, 
-                self.amplitude, 
-                attack=self.attack, 
-                decay=self.decay, 
-                sustain=self.sustain, 
-                release=self.release
-            )
-        elif self.current_waveform_type == "square":
-            waveform, sr, total_duration = generate_square_wave(
-                self.frequency, 
-                self.amplitude
-            )
-        elif self.current_waveform_type == "sawtooth":
-            waveform, sr, total_duration = generate_sawtooth_wave(
-                self.frequency, 
-                self.amplitude
-            )
-        
-        edited_waveform = waveform.copy()
-        
-        # Apply low-pass filter if checked
-        if self.lowpass_checkbox.isChecked():
-            edited_waveform = apply_lowpass_filter(edited_waveform, cutoff=self.cutoff, sample_rate=sr)
-        
-        # Apply distortion filter if checked
-        if self.distortion_checkbox.isChecked():
-            edited_waveform = apply_distortion(edited_waveform)
-            
-        # Apply noise filter if checked
-        if self.noise_checkbox.isChecked():
-            edited_waveform = generate_noise(amplitude=self.amplitude)
-        
-        # Apply vibrato filter if checked
-        if self.vibrato_checkbox.isChecked():
-            edited_waveform, sr, total_duration = generate_vibrato(frequency=self.frequency, amplitude=self.amplitude)
-        
-        # Apply bit depth conversion if checked
-        if self.bit_depth_checkbox.isChecked():
-            edited_waveform = convert_to_bit_depth(edited_waveform, bit_depth=8)
-            # Convert from uint8 to appropriate range
-            edited_waveform = (edited_waveform.astype(np.int16) - 128) * 256
-        
+        if self.render_worker is None:
+            return  # Still starting up; finish_startup renders the current settings
+        # The live preview picks the new settings up on its next audio block
+        self.parameters.publish(self.current_patch())
+        # Hand the render to the worker thread; only the newest request gets plotted
+        self.render_request_id += 1
+        self.render_worker.submit(self.render_request_id, self.current_patch())
+
+    def on_waveform_rendered(self, request_id, patch, result):
+        if request_id != self.render_request_id:
+            return  # A newer request is already pending, skip this stale result
+        edited_waveform, sr, total_duration = result
+
         # Update the waveform display
-        title = f"{self.current_waveform_type.capitalize()} Wave ({self.frequency} Hz)"
+        title = f"{patch['waveform'].capitalize()} Wave ({patch['frequency']} Hz)"
         self.waveform_canvas.plot_waveform(edited_waveform, sr, total_duration, title)
+        if "first waveform" not in STARTUP.marks:
+            STARTUP.mark("first waveform")
+            if STARTUP_TIMING:
+                QTimer.singleShot(0, self.finish_startup_timing)
 
     # ===== PLAY SOUND FUNCTIONS =====
-    def play_square_sound(self):
-        self.current_waveform_type = "square"
+    def toggle_live_preview(self):
+        if self.live_voice is not None:
+            self.live_voice.stop()  # Fades out, then the engine drops it
+            self.live_voice = None
+        if self.live_checkbox.isChecked():
+            from live import LiveVoice
+            self.live_voice = LiveVoice(self.parameters, self.engine.sample_rate)
+            self.engine.play(self.live_voice)
+
+    @timed("play")
+    def play_sound(self, waveform_type):
+        # The note replaces the preview, which is stopped here and fades out under the note
+        self.live_checkbox.setChecked(False)
+        playing = self.engine.source
+        fading = playing if getattr(playing, "stopping", False) else None
+        self.current_waveform_type = waveform_type
+
+        # Render (or fetch the preview's render) before queueing the preview,
+        # so the worker then finds this result in the cache too
+        edited_waveform, sr, total_duration = self.render_cache.get_or_render(self.current_patch())
         self.update_waveform()
-        
-        waveform, sr, total_duration = generate_square_wave(
-            self.frequency, 
-            self.amplitude
-        )
-        
-        edited_waveform = waveform.copy()
-    
-        # Apply low-pass filter
-        if self.lowpass_checkbox.isChecked():
-            edited_waveform = apply_lowpass_filter(edited_waveform, cutoff=self.cutoff, sample_rate=sr)
-            
-        # Apply distortion filter if checked
-        if self.distortion_checkbox.isChecked():
-            edited_waveform = apply_distortion(edited_waveform)
-            
-        # Apply noise filter if checked
-        if self.noise_checkbox.isChecked():
-            edited_waveform = generate_noise(amplitude=self.amplitude)
-            
-        # Apply vibrato filter if checked
-        if self.vibrato_checkbox.isChecked():
-            edited_waveform, sr, total_duration = generate_vibrato(frequency=self.frequency, amplitude=self.amplitude)
-        
-        # If the checkbox is checked, convert the waveform to 8-bit
-        if self.bit_depth_checkbox.isChecked():
-            edited_waveform = convert_to_bit_depth(edited_waveform, bit_depth=8)
-            # Properly convert from uint8 (0 to 255) to int16 (-32768 to 32767)
-            edited_waveform = (edited_waveform.astype(np.int16) - 128) * 256
-
-        # Play the generated sound
-        sd.play(edited_waveform, sr)
-
-        # Save the sound file with correct duration
-        sf.write("generated_audio.wav", edited_waveform, sr)
-        # print("Waveform Stats:")
-        # print("Min:", np.min(waveform), "Max:", np.max(waveform), "Mean:", np.mean(waveform))
-        # print("Sample Rate:", sr, "Duration:", total_duration)
-        
+        self.show_cache_stats()
+
+        # Play the generated sound through the output stream
+        self.engine.play_buffer(edited_waveform, fading)
+
+        # Save the sound file in the background
+        path = self.exporter.export(edited_waveform, sr, self.export_format_combo.currentText())
+        if path is None:
+            self.statusBar().showMessage("Export skipped: too many files still being written", 3000)
+
+    def on_export_finished(self, path, error):
+        if error is not None:
+            self.statusBar().showMessage(f"Could not save {path}: {error}", 5000)
+        else:
+            self.statusBar().showMessage(f"Saved {path}", 3000)
+
+    def play_square_sound(self):
+        self.play_sound("square")
+
     def play_sawtooth_sound(self):
-        self.current_waveform_type = "sawtooth"
-        self.update_waveform()
-        
-        waveform, sr, total_duration = generate_sawtooth_wave(
-            self.frequency, 
-            self.amplitude
-        )
-        
-        edited_waveform = waveform.copy()
-    
-        # Apply low-pass filter
-        if self.lowpass_checkbox.isChecked():
-            edited_waveform = apply_lowpass_filter(edited_waveform, cutoff=self.cutoff, sample_rate=sr)
-            
-        # Apply distortion filter if checked
-        if self.distortion_checkbox.isChecked():
-            edited_waveform = apply_distortion(edited_waveform)
-            
-        # Apply noise filter if checked
-        if self.noise_checkbox.isChecked():
-            edited_waveform = generate_noise(amplitude=self.amplitude)
-            
-        # Apply vibrato filter if checked
-        if self.vibrato_checkbox.isChecked():
-            edited_waveform, sr, total_duration = generate_vibrato(frequency=self.frequency, amplitude=self.amplitude)
-        
-        # If the checkbox is checked, convert the waveform to 8-bit
-        if self.bit_depth_checkbox.isChecked():
-            edited_waveform = convert_to_bit_depth(edited_waveform, bit_depth=8)
-            # Properly convert from uint8 (0 to 255) to int16 (-32768 to 32767)
-            edited_waveform = (edited_waveform.astype(np.int16) - 128) * 256
-
-        # Play the generated sound
-        sd.play(edited_waveform, sr)
-
-        # Save the sound file with correct duration
-        sf.write("generated_audio.wav", edited_waveform, sr)
-        # print("Waveform Stats:")
-        # print("Min:", np.min(waveform), "Max:", np.max(waveform), "Mean:", np.mean(waveform))
-        # print("Sample Rate:", sr, "Duration:", total_duration)
-        
+        self.play_sound("sawtooth")
+
     def play_sine_sound(self):
-        self.current_waveform_type = "sine"
-        self.update_waveform()
-        
-        waveform, sr, total_duration = generate_sine_wave(
-            self.frequency, 
-            self.amplitude, 
-            attack=self.attack, 
-            decay=self.decay, 
-            sustain=self.sustain, 
-            release=self.release
+        self.play_sound("sine")
+
+    def show_cache_stats(self):
+        cache = self.render_cache
+        self.statusBar().showMessage(
+            f"Render cache: {cache.hits} hits, {cache.misses} misses, "
+            f"{cache.current_bytes / 1e6:.1f} MB"
         )
-        
-        edited_waveform = waveform.copy()
-    
-        # Apply low-pass filter
-        if self.lowpass_checkbox.isChecked():
-            edited_waveform = apply_lowpass_filter(edited_waveform, cutoff=self.cutoff, sample_rate=sr)
-            
-        # Apply distortion filter if checked
-        if self.distortion_checkbox.isChecked():
-            edited_waveform = apply_distortion(edited_waveform)
-            
-        # Apply noise filter if checked
-        if self.noise_checkbox.isChecked():
-            edited_waveform = generate_noise(amplitude=self.amplitude)
-            
-        # Apply vibrato filter if checked
-        if self.vibrato_checkbox.isChecked():
-            edited_waveform, sr, total_duration = generate_vibrato(frequency=self.frequency, amplitude=self.amplitude)
-        
-        # If the checkbox is checked, convert the waveform to 8-bit
-        if self.bit_depth_checkbox.isChecked():
-            edited_waveform = convert_to_bit_depth(edited_waveform, bit_depth=8)
-            # Properly convert from uint8 (0 to 255) to int16 (-32768 to 32767)
-            edited_waveform = (edited_waveform.astype(np.int16) - 128) * 256
-
-        # Play the generated sound
-        sd.play(edited_waveform, sr)
-
-        # Save the sound file with correct duration
-        sf.write("generated_audio.wav", edited_waveform, sr)
-        # print("Waveform Stats:")
-        # print("Min:", np.min(waveform), "Max:", np.max(waveform), "Mean:", np.mean(waveform))
-        # print("Sample Rate:", sr, "Duration:", total_duration)
 
 
 # Run Application
@@ -0,0 +1,188 @@
+"""Control-rate modulation: LFOs and envelopes routed to pitch, amplitude, filter cutoff and distortion gain.
+
+    matrix = ModulationMatrix(sample_rate=44100, control_period=32)
+    matrix.add_lfo("lfo", rate=5.0)
+    matrix.add_envelope("env", attack=0.01, decay=0.3, sustain=0.0, release=0.1)
+    matrix.connect("lfo", "pitch", 0.3)   # +-0.3 semitones of vibrato
+    matrix.connect("env", "cutoff", 2.0)  # the filter opens two octaves on every note
+    voice = ModulatedVoice(220, 0.5, "sawtooth", matrix=matrix, cutoff=800)
+
+Sources are evaluated once every `control_period` samples and linearly
+interpolated in between. A routing therefore costs one source value per
+control step plus one np.interp per target and block, not per-sample
+source math.
+"""
+import numpy as np
+
+from audio_utils import (DEFAULT_DTYPE, WAVE_SHAPES, EnvelopeGenerator, LowpassFilter, Oscillator,
+                         accumulate_phase)
+from wavetables import WAVETABLE_SHAPES, build_mipmap, octave_for, table_lookup
+
+CONTROL_PERIOD = 32  # Samples between control points
+TARGETS = {"pitch": "semitones", "amplitude": "dB", "cutoff": "octaves", "distortion_gain": "gain"}
+CUTOFF_STEPS_PER_OCTAVE = 12  # Modulated cutoffs are rounded so the filter designs stay cached
+MIN_CUTOFF = 20.0
+
+VIBRATO_RATE = 5.0
+VIBRATO_DEPTH = 0.34  # Semitones, about the +-2 % pitch swing of the old vibrato effect
+
+
+class LFO:
+    """Low-frequency oscillator in [-1, 1], a phase accumulator stepped at the control rate."""
+
+    def __init__(self, rate=5.0, control_rate=44100 / CONTROL_PERIOD, shape="sine"):
+        if shape not in WAVE_SHAPES:
+            raise ValueError(f"Unknown LFO shape: {shape}")
+        self.rate = rate
+        self.control_rate = control_rate
+        self.shape = shape
+        self.phase = 0.0
+
+    def process(self, steps):
+        increment = self.rate / self.control_rate
+        phase = self.phase + increment * np.arange(steps)
+        self.phase = (self.phase + increment * steps) % 1.0
+        return WAVE_SHAPES[self.shape](phase)
+
+
+class ModulationMatrix:
+    """Routes modulation sources to targets with a depth per route.
+
+    A source is anything with `process(steps)` returning one value per
+    control step; LFO and EnvelopeGenerator (clocked at the control rate)
+    are the built-in ones. Depths are in the units listed in TARGETS.
+    """
+
+    def __init__(self, sample_rate=44100, control_period=CONTROL_PERIOD):
+        self.sample_rate = sample_rate
+        self.control_period = control_period
+        self.control_rate = sample_rate / control_period
+        self.sources = {}
+        self.routes = {}  # Target -> [(source name, depth), ...]
+        self.position = 0  # Samples rendered so far
+        self._last_point = -1  # Index of the last control point evaluated
+        self._tail = {}  # Target -> its last two control points, for interpolating into the next block
+
+    def add_source(self, name, source):
+        self.sources[name] = source
+        return source
+
+    def add_lfo(self, name, rate=5.0, shape="sine"):
+        return self.add_source(name, LFO(rate, self.control_rate, shape))
+
+    def add_envelope(self, name, attack=0.1, decay=0.1, sustain=0.7, release=0.2):
+        return self.add_source(name, EnvelopeGenerator(attack, decay, sustain, release, self.control_rate,
+                                                       np.float64))
+
+    def connect(self, source, target, depth):
+        if source not in self.sources:
+            raise ValueError(f"Unknown modulation source: {source}")
+        if target not in TARGETS:
+            raise ValueError(f"Unknown modulation target: {target}")
+        self.routes.setdefault(target, []).append((source, depth))
+
+    def gate_on(self):
+        for source in self.sources.values():
+            if hasattr(source, "gate_on"):
+                source.gate_on()
+
+    def gate_off(self):
+        for source in self.sources.values():
+            if hasattr(source, "gate_off"):
+                source.gate_off()
+
+    def process(self, frames):
+        """Per-sample modulation of every routed target for the next `frames` samples.
+
+        Returns a dict of target -> float64 array; unrouted targets are absent.
+        """
+        period = self.control_period
+        stop = self.position + frames
+        last_point = -(-(stop - 1) // period)  # First control point at or after the block's last sample
+        first_new = self._last_point + 1
+        steps = max(last_point - first_new + 1, 0)
+        values = {name: source.process(steps) for name, source in self.sources.items()}
+
+        samples = np.arange(self.position, stop)
+        modulation = {}
+        for target, routes in self.routes.items():
+            points = np.zeros(steps)
+            for source, depth in routes:
+                points += depth * values[source]
+            previous_indices, previous = self._tail.get(target, ((), ()))
+            indices = np.concatenate((previous_indices, np.arange(first_new, first_new + steps)))
+            points = np.concatenate((previous, points))
+            modulation[target] = np.interp(samples, indices * period, points)
+            self._tail[target] = (indices[-2:], points[-2:])
+
+        self._last_point = max(last_point, self._last_point)
+        self.position = stop
+        return modulation
+
+
+def vibrato_matrix(sample_rate=44100, rate=VIBRATO_RATE, depth=VIBRATO_DEPTH):
+    """Matrix with a single sine LFO on pitch, used for a patch's vibrato flag."""
+    matrix = ModulationMatrix(sample_rate)
+    matrix.add_lfo("vibrato", rate)
+    matrix.connect("vibrato", "pitch", depth)
+    return matrix
+
+
+class ModulatedVoice(Oscillator):
+    """Wavetable voice whose pitch, level, cutoff and distortion gain follow a ModulationMatrix.
+
+    The instantaneous frequency is integrated with a phase accumulator, so
+    pitch modulation never makes the phase jump. The low-pass filter (when
+    `cutoff` is given) is retuned once per control step and crossfades
+    between designs; distortion is applied when `distortion_gain` is given.
+    """
+
+    def __init__(self, frequency, amplitude, shape="sine", sample_rate=44100, matrix=None, cutoff=None,
+                 distortion_gain=None, distortion_mix=0.5, dtype=DEFAULT_DTYPE):
+        super().__init__(frequency, amplitude, sample_rate, dtype)
+        if shape not in WAVETABLE_SHAPES:
+            raise ValueError(f"Unknown wavetable shape: {shape}")
+        self.levels = build_mipmap(shape, sample_rate, dtype=self.dtype)
+        self.matrix = matrix if matrix is not None else ModulationMatrix(sample_rate)
+        self.cutoff = cutoff
+        self.filter = LowpassFilter(cutoff, sample_rate, dtype=self.dtype) if cutoff is not None else None
+        self.distortion_gain = distortion_gain
+        self.distortion_mix = distortion_mix
+
+    def gate_on(self):
+        self.matrix.gate_on()
+
+    def gate_off(self):
+        self.matrix.gate_off()
+
+    def process(self, frames):
+        modulation = self.matrix.process(frames)
+        increment = self.frequency / self.sample_rate
+        if "pitch" in modulation:
+            increment = increment * np.exp2(modulation["pitch"] / 12)
+        phase, self.phase = accumulate_phase(self.phase, np.broadcast_to(increment, frames))
+        # One mipmap level per block, picked for the highest frequency in it
+        block = table_lookup(self.levels, int(octave_for(np.max(increment) * self.sample_rate)), phase)
+
+        if "amplitude" in modulation:
+            block *= self.amplitude * 10 ** (modulation["amplitude"] / 20)
+        else:
+            block *= self.amplitude
+        if self.filter is not None:
+            block = self._filter(block, modulation.get("cutoff"))
+        if self.distortion_gain is not None:
+            gain = self.distortion_gain + modulation.get("distortion_gain", 0)
+            block += self.distortion_mix * (np.tanh(gain * block) - block)
+        return block
+
+    def _filter(self, block, octaves):
+        if octaves is None:
+            return self.filter.process(block)
+        period = self.matrix.control_period
+        steps = np.round(octaves[::period] * CUTOFF_STEPS_PER_OCTAVE) / CUTOFF_STEPS_PER_OCTAVE
+        cutoffs = np.clip(self.cutoff * np.exp2(steps), MIN_CUTOFF, 0.45 * self.sample_rate)
+        output = np.empty_like(block)
+        for start, cutoff in zip(range(0, len(block), period), cutoffs):
+            self.filter.set_cutoff(float(cutoff))
+            output[start:start + period] = self.filter.process(block[start:start + period])
+        return output
@@ -0,0 +1,125 @@
+"""Load test for render_server.py: requests per second and latency percentiles per pool size.
+
+Starts a server for each pool size in a separate process, then sends
+patches from several client threads, each with its own RenderClient. A
+share of the requests repeat recent patches, so the numbers include cache
+hits the way an interactive tool would produce them.
+
+Usage:
+    python render_load_test.py --pool-sizes 1 2 4 8 --requests 400 --clients 8
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from render_server import RenderClient
+
+WAVEFORMS = ("sine", "square", "sawtooth")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def patches(count, repeat, rng):
+    """`count` patches of which about `repeat` (a fraction) are exact repeats of earlier ones."""
+    unique = []
+    for _ in range(count):
+        if unique and rng.random() < repeat:
+            yield unique[rng.integers(len(unique))]
+            continue
+        patch = {"waveform": WAVEFORMS[rng.integers(3)], "frequency": float(rng.uniform(55, 1760)),
+                 "lowpass": bool(rng.random() < 0.5), "vibrato": bool(rng.random() < 0.25),
+                 "cutoff": float(rng.uniform(200, 8000)), "release": 0.3}
+        unique.append(patch)
+        yield patch
+
+
+def start_server(workers, cache_mb):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             "render_server.py"),
+                                "--port", str(port), "--workers", str(workers), "--cache-mb", str(cache_mb)],
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while True:  # Ready once the workers are warm and the socket accepts requests
+        try:
+            client = RenderClient(("127.0.0.1", port), timeout=5)
+            client.stats()
+            client.close()
+            return process, port
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("Render server did not start")
+            time.sleep(0.1)
+
+
+def run(port, jobs, clients):
+    """Send `jobs` from `clients` threads; returns (elapsed seconds, per-request latencies)."""
+    latencies = np.zeros(len(jobs))
+    errors = []
+
+    def worker(indices):
+        client = RenderClient(("127.0.0.1", port))
+        try:
+            for index in indices:
+                start = time.perf_counter()
+                client.render(jobs[index])
+                latencies[index] = time.perf_counter() - start
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(range(i, len(jobs), clients),)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return elapsed, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure render server throughput and latency per pool size.")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("-n", "--requests", type=int, default=400)
+    parser.add_argument("-c", "--clients", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--repeat", type=float, default=0.5,
+                        help="fraction of requests that repeat an earlier patch (default: %(default)s)")
+    parser.add_argument("--cache-mb", type=float, default=256)
+    args = parser.parse_args(argv)
+
+    print(f"{args.requests} requests from {args.clients} clients, {args.repeat:.0%} repeats")
+    print(f"{'workers':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'hit rate':>9}")
+    for workers in sorted(set(args.pool_sizes)):
+        jobs = list(patches(args.requests, args.repeat, np.random.default_rng(0)))
+        process, port = start_server(workers, args.cache_mb)
+        try:
+            elapsed, latencies = run(port, jobs, args.clients)
+            client = RenderClient(("127.0.0.1", port))
+            stats = client.stats()
+            client.close()
+        finally:
+            process.send_signal(signal.SIGINT)  # Lets the server unlink its shared memory
+            process.wait()
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        hit_rate = stats["hits"] / max(stats["hits"] + stats["misses"], 1)
+        print(f"{workers:>8} {len(jobs) / elapsed:>9.1f} {p50:>9.2f} {p99:>9.2f} {hit_rate:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
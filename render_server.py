@@ -0,0 +1,402 @@
+"""Local render server: synth renders for other tools without the GUI.
+
+    python render_server.py --port 8765 --workers 4
+    python render_server.py --unix /tmp/cute_synth.sock
+
+Patches (dicts of rendering.DEFAULT_PATCH keys) are POSTed as JSON and
+rendered in a pool of worker processes that are warmed up before the server
+accepts requests. The audio is not sent over the socket: a worker renders
+straight into a multiprocessing.shared_memory segment and the response only
+names it, so a client maps the samples instead of deserializing them.
+
+    POST /render      patch -> {"shm", "frames", "dtype", "sample_rate", "duration", "cached"}
+    POST /render.wav  patch -> 16-bit WAV bytes, for clients that cannot map shared memory
+    GET  /stats       cache and pool statistics
+
+Recent renders stay cached (and their segments alive) until they are evicted
+from an LRU bounded by total size; the same patch requested again, or while
+it is still rendering, is answered from the one render. RenderClient wraps
+the protocol:
+
+    client = RenderClient(("127.0.0.1", 8765))
+    waveform, sample_rate, duration = client.render({"waveform": "square", "frequency": 220})
+"""
+import argparse
+import http.client
+import io
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from rendering import WAVEFORMS, PatchRenderer, RenderCache, full_patch, patch_frames
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+# ===== WORKERS =====
+_renderer = None  # One PatchRenderer per worker process
+
+
+def _warm_worker():
+    """Pool initializer: import and build everything a render needs before the first request."""
+    global _renderer
+    _renderer = PatchRenderer()
+    for waveform in WAVEFORMS:
+        for vibrato in (False, True):
+            _renderer.render({"waveform": waveform, "vibrato": vibrato, "lowpass": True, "noise": vibrato,
+                              "attack": 0.01, "decay": 0.01, "sustain": 0.0, "hold": 0.0, "release": 0.01})
+
+
+def _render_shared(patch):
+    """Render a full patch into a new shared memory segment and return its handle."""
+    dtype = np.dtype(patch["dtype"])
+    frames = patch_frames(patch)
+    segment = SharedMemory(create=True, size=max(frames * dtype.itemsize, 1))
+    try:
+        _, sample_rate, duration = _renderer.render(patch, out=np.ndarray(frames, dtype, buffer=segment.buf))
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+    segment.close()
+    # Ownership passes to the server, which unlinks the segment on eviction: this worker's
+    # resource tracker must not unlink it (or warn about it) when the worker exits
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return {"shm": segment.name, "frames": frames, "dtype": dtype.name, "sample_rate": sample_rate,
+            "duration": duration}
+
+
+def _unlink(name):
+    try:
+        segment = SharedMemory(name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+class SharedRenderCache:
+    """LRU of shared memory render handles, bounded by the total size of their segments.
+
+    Evicting a handle unlinks its segment: clients that already mapped it
+    keep their mapping, new clients can no longer attach.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def nbytes(handle):
+        return handle["frames"] * np.dtype(handle["dtype"]).itemsize
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            handle = self._entries.get(key)
+            if handle is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return handle
+
+    def put(self, key, handle):
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                evicted.append(self._entries.pop(key))
+                self.current_bytes -= self.nbytes(evicted[-1])
+            self._entries[key] = handle
+            self.current_bytes += self.nbytes(handle)
+            # Keep at least the new entry, even if it is larger than the whole budget
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self.current_bytes -= self.nbytes(old)
+                evicted.append(old)
+        for old in evicted:
+            _unlink(old["shm"])
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self.current_bytes = 0
+        for handle in entries:
+            _unlink(handle["shm"])
+
+
+# ===== SERVER =====
+class RenderServer:
+    """Process pool, render cache and in-flight deduplication behind the HTTP handler.
+
+    `address` is a (host, port) pair for localhost HTTP or a path for a Unix
+    socket. The pool is created and warmed in the constructor, before any
+    server thread exists.
+    """
+
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), workers=None, cache_bytes=DEFAULT_CACHE_BYTES,
+                 verbose=False):
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # One task per worker forces every process to start (and warm up) now
+        for future in [self.pool.submit(int) for _ in range(self.workers)]:
+            future.result()
+        self.cache = SharedRenderCache(cache_bytes)
+        self.verbose = verbose
+        self._pending = {}  # Cache key -> Future of a render in progress
+        self._lock = threading.Lock()
+        self._uncached = itertools.count()
+
+        if isinstance(address, str):
+            self.http = UnixHTTPServer(address, RenderRequestHandler)
+        else:
+            self.http = ThreadingHTTPServer(address, RenderRequestHandler)
+        self.http.render_server = self
+        self.address = self.http.server_address
+
+    def render(self, patch):
+        """Handle of the render of `patch`, and whether it came from the cache or a render in progress."""
+        patch = full_patch(patch)
+        if RenderCache.is_random(patch):
+            # Fresh noise every time: still kept in the LRU, so its segment is unlinked on eviction
+            key = ("uncached", next(self._uncached))
+        else:
+            key = RenderCache.key(patch)
+            handle = self.cache.get(key)
+            if handle is not None:
+                return handle, True
+
+        with self._lock:
+            future = self._pending.get(key)
+            shared = future is not None
+            if not shared:
+                future = self._pending[key] = self.pool.submit(_render_shared, patch)
+        try:
+            handle = future.result()
+            if not shared:
+                self.cache.put(key, handle)  # Before leaving _pending, so no request slips in between
+        finally:
+            if not shared:
+                with self._lock:
+                    del self._pending[key]
+        return handle, shared
+
+    def stats(self):
+        cache = self.cache
+        return {"workers": self.workers, "cache_entries": len(cache), "cache_bytes": cache.current_bytes,
+                "hits": cache.hits, "misses": cache.misses, "in_flight": len(self._pending)}
+
+    def serve_forever(self):
+        self.http.serve_forever()
+
+    def close(self):
+        """Stop serving, stop the workers and unlink every cached segment."""
+        self.http.shutdown()
+        self.http.server_close()
+        self.pool.shutdown()
+        self.cache.clear()
+        if isinstance(self.address, str):
+            os.unlink(self.address)
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)  # Left over from a server that did not shut down cleanly
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients reuse one connection
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.render_server.stats())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/render", "/render.wav"):
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_REQUEST_BYTES:
+                raise ValueError("Request body too large")
+            patch = json.loads(self.rfile.read(length))
+            if not isinstance(patch, dict):
+                raise ValueError("Expected a JSON object")
+            handle, cached = self.server.render_server.render(patch)
+        except (ValueError, TypeError, KeyError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+        except Exception as exc:  # A failed render is reported, it does not take the server down
+            self._send_json(500, {"error": repr(exc)})
+            return
+
+        if self.path == "/render":
+            self._send_json(200, {**handle, "cached": cached})
+        else:
+            self._send(200, "audio/wav", self._wav(patch, handle))
+
+    def _wav(self, patch, handle):
+        import soundfile as sf
+        try:
+            segment = SharedMemory(handle["shm"])
+        except FileNotFoundError:  # Evicted since it was looked up: render it again
+            handle, _ = self.server.render_server.render(patch)
+            segment = SharedMemory(handle["shm"])
+        try:
+            waveform = np.ndarray(handle["frames"], handle["dtype"], buffer=segment.buf)
+            data = io.BytesIO()
+            sf.write(data, waveform, handle["sample_rate"], format="WAV", subtype="PCM_16")
+            del waveform
+        finally:
+            segment.close()
+        return data.getvalue()
+
+    def _send_json(self, status, payload):
+        self._send(status, "application/json", json.dumps(payload).encode())
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.render_server.verbose:
+            super().log_message(format, *args)
+
+
+# ===== CLIENT =====
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class RenderClient:
+    """Keep-alive connection to a RenderServer; one client per thread.
+
+    `render` returns read-only arrays that map the server's shared memory.
+    They stay valid until `close`, even after the server evicts the render;
+    copy anything that must outlive the client.
+    """
+
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), timeout=60):
+        if isinstance(address, str):
+            self.connection = UnixHTTPConnection(address, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(*address, timeout=timeout)
+        self._segments = {}  # Segment name -> SharedMemory mapped by this client
+
+    def request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode()
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.status == 400:
+            raise ValueError(json.loads(data)["error"])
+        if response.status != 200:
+            raise RuntimeError(f"Render server returned {response.status}: {data[:200]!r}")
+        return data
+
+    def render_handle(self, patch):
+        return json.loads(self.request("POST", "/render", patch))
+
+    def render(self, patch):
+        """Render `patch` on the server and return (waveform, sample_rate, duration)."""
+        for _ in range(3):
+            handle = self.render_handle(patch)
+            try:
+                segment = self._attach(handle["shm"])
+            except FileNotFoundError:
+                continue  # Evicted between the response and the attach; the next request renders it again
+            waveform = np.ndarray(handle["frames"], handle["dtype"], buffer=segment.buf)
+            waveform.setflags(write=False)
+            return waveform, handle["sample_rate"], handle["duration"]
+        raise RuntimeError("Render was evicted before it could be mapped; the server cache is too small")
+
+    def render_wav(self, patch):
+        return self.request("POST", "/render.wav", patch)
+
+    def stats(self):
+        return json.loads(self.request("GET", "/stats"))
+
+    def _attach(self, name):
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = SharedMemory(name)
+            # The server owns the segment, see _render_shared
+            resource_tracker.unregister(segment._name, "shared_memory")
+            self._segments[name] = segment
+        return segment
+
+    def close(self):
+        """Close the connection and unmap every segment; arrays from `render` must not be used after this."""
+        self.connection.close()
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synth renders to local tools over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: all CPUs)")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_BYTES / 2 ** 20,
+                        help="shared memory kept for recent renders (default: %(default)s)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = RenderServer(args.unix or (args.host, args.port), args.workers, int(args.cache_mb * 2 ** 20),
+                          args.verbose)
+    print(f"Serving renders on {args.unix or f'http://{args.host}:{server.address[1]}'} "
+          f"with {args.workers} workers", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
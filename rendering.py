@@ -0,0 +1,256 @@
+import mmap
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from audio_utils import DEFAULT_BLOCK_SIZE, WavetableOscillator, iter_note, render_note
+from effects import BufferPool, EffectsChain
+from instrumentation import returned_duration, timed
+from modulation import ModulatedVoice, vibrato_matrix
+
+DEFAULT_PATCH = {
+    "waveform": "sine",
+    "frequency": 440,
+    "amplitude": 0.5,
+    "attack": 0.1,
+    "decay": 0.1,
+    "sustain": 0.7,  # Envelope level while the note is held, 0-1
+    "hold": 0.7,  # Seconds the note is held at the sustain level, which sets the render's length
+    "release": 0.2,
+    "cutoff": 1000,
+    "lowpass": False,
+    "distortion": False,
+    "noise": False,
+    "noise_color": "white",  # white, pink or brown
+    "noise_mix": 1.0,  # 1 replaces the oscillator with noise, lower values mix the two
+    "noise_seed": 0,  # Fixed by default so a noise render is reproducible and cacheable; None for fresh noise
+    "vibrato": False,
+    "bit_crush": False,
+    "bit_depth": 8,  # Bit crusher levels, 1-24 bits
+    "downsample": 1,  # Bit crusher sample-and-hold factor, 1 keeps the sample rate
+    "dither": False,  # TPDF dither before quantizing, seeded by noise_seed
+    "sample_rate": 44100,
+    "dtype": "float32",
+}
+
+WAVEFORMS = ("sine", "square", "sawtooth")
+OFFLINE_BLOCK = 65536  # Frames per chunk when rendering offline
+RELEASE_BYTES = 16 * 1024 * 1024  # Written memmap pages are dropped from memory in steps of this size
+
+
+def full_patch(patch):
+    """`patch` completed with the defaults, after checking its waveform and sustain level."""
+    patch = {**DEFAULT_PATCH, **patch}
+    if patch["waveform"] not in WAVEFORMS:
+        raise ValueError(f"Unknown waveform type: {patch['waveform']}")
+    if not 0 <= patch["sustain"] <= 1:
+        raise ValueError(f"Sustain is a level from 0 to 1, got {patch['sustain']}; set the length with hold")
+    return patch
+
+
+def open_memmap(path, patch):
+    """Disk-backed output array of the right length and dtype for render_offline."""
+    patch = full_patch(patch)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=patch["dtype"], shape=(patch_frames(patch),))
+
+
+def patch_duration(patch):
+    """Length of a patch's render in seconds: attack + decay + hold + release."""
+    return patch["attack"] + patch["decay"] + patch["hold"] + patch["release"]
+
+
+def patch_frames(patch):
+    """Number of samples in a patch's render."""
+    return int(patch["sample_rate"] * patch_duration(patch))
+
+
+def patch_oscillator(patch, dtype):
+    """Oscillator for a full patch; vibrato is an LFO on its pitch."""
+    sample_rate = patch["sample_rate"]
+    if patch["vibrato"]:
+        return ModulatedVoice(patch["frequency"], patch["amplitude"], patch["waveform"], sample_rate,
+                              vibrato_matrix(sample_rate), dtype=dtype)
+    return WavetableOscillator(patch["frequency"], patch["amplitude"], patch["waveform"], sample_rate, dtype=dtype)
+
+
+class PatchRenderer:
+    """Renders patches through the effects chain, reusing its scratch buffers.
+
+    Not thread-safe: use one renderer per thread (render_patch does this).
+    """
+
+    def __init__(self):
+        self.pool = BufferPool()
+
+    @timed("render", returned_duration)
+    def render(self, patch, out=None):
+        """Render a patch to (waveform, sample_rate, duration).
+
+        The waveform is written into `out` when given, so a caller that
+        reuses its output buffer renders without allocating large arrays.
+        """
+        patch = full_patch(patch)
+        sample_rate = patch["sample_rate"]
+        dtype = np.dtype(patch["dtype"])
+        duration = patch_duration(patch)
+        frames = patch_frames(patch)
+        output = np.empty(frames, dtype=dtype) if out is None else out[:frames]
+
+        # Generate waveform based on type, shaped by the ADSR envelope
+        render_note(patch_oscillator(patch, dtype), frames, patch["attack"], patch["decay"], patch["sustain"], patch["release"],
+                    sample_rate, out=output)
+
+        EffectsChain.from_patch(patch, self.pool).process(output)
+        return output, sample_rate, duration
+
+    def iter_blocks(self, patch, block_frames=OFFLINE_BLOCK):
+        """Yield the render of `patch` as consecutive blocks of at most `block_frames` samples.
+
+        Oscillator phase, envelope, filter and noise state carry over from
+        block to block, so memory does not grow with the render's length,
+        and the concatenated blocks equal `render` sample for sample. The
+        block buffer is reused: copy a block if it must outlive the next
+        iteration.
+        """
+        patch = full_patch(patch)
+        dtype = np.dtype(patch["dtype"])
+        chain = EffectsChain.from_patch(patch, self.pool)
+        chain.reset()
+        buffer = np.empty(max(block_frames, DEFAULT_BLOCK_SIZE), dtype=dtype)
+        filled = 0
+        # Same oscillator blocks as render, gathered into larger blocks for the effects
+        for note_block in iter_note(patch_oscillator(patch, dtype), patch_frames(patch), patch["attack"],
+                                    patch["decay"], patch["sustain"], patch["release"], patch["sample_rate"]):
+            if filled + len(note_block) > len(buffer):
+                yield chain.process_block(buffer[:filled])
+                filled = 0
+            buffer[filled:filled + len(note_block)] = note_block
+            filled += len(note_block)
+        if filled:
+            yield chain.process_block(buffer[:filled])
+
+    @timed("render offline", returned_duration)
+    def render_offline(self, patch, out, block_frames=OFFLINE_BLOCK):
+        """Render a patch of any length into `out` block by block.
+
+        The length comes from the patch's `hold` time (see patch_frames),
+        e.g. {"hold": 3600} for an hour at the sustain level. `out` is an
+        array such as an np.memmap (see open_memmap), or an open
+        soundfile.SoundFile to stream to. Returns (out, sample_rate, duration).
+        """
+        patch = full_patch(patch)
+        position = 0
+        released = 0
+        for block in self.iter_blocks(patch, block_frames):
+            if isinstance(out, np.ndarray):
+                out[position:position + len(block)] = block
+                released = _release_pages(out, released, position + len(block))
+            else:
+                out.write(block)
+            position += len(block)
+        return out, patch["sample_rate"], patch_duration(patch)
+
+
+def _release_pages(out, released, stop):
+    """Drop the written pages of an np.memmap from this process, so RSS does not grow with the file.
+
+    The data stays in the page cache and reaches the file as usual. Returns
+    the new number of released bytes; arrays that are not memory-mapped are
+    left alone.
+    """
+    mapping = out.base
+    if not isinstance(out, np.memmap) or not isinstance(mapping, mmap.mmap) or not hasattr(mmap, "MADV_DONTNEED"):
+        return released
+    # The array starts `offset % ALLOCATIONGRANULARITY` bytes into its mapping (see np.memmap)
+    end = (out.offset % mmap.ALLOCATIONGRANULARITY + stop * out.itemsize) // mmap.PAGESIZE * mmap.PAGESIZE
+    if end - released >= RELEASE_BYTES:
+        mapping.madvise(mmap.MADV_DONTNEED, released, end - released)
+        released = end
+    return released
+
+
+_local = threading.local()
+
+def render_patch(patch):
+    """Render a patch (a dict of DEFAULT_PATCH keys) to (waveform, sample_rate, duration).
+
+    Returns a new waveform array; scratch buffers are reused per thread, so
+    this is safe to call from a worker thread.
+    """
+    renderer = getattr(_local, "renderer", None)
+    if renderer is None:
+        renderer = _local.renderer = PatchRenderer()
+    return renderer.render(patch)
+
+
+class RenderCache:
+    """LRU cache of render_patch results, bounded by the total size of the cached buffers.
+
+    Keyed on the full parameter snapshot, so playing a patch that was just
+    previewed (or switching back to an earlier setting) skips the render.
+    Patches with fresh randomness (see is_random) are never cached, so
+    every render of them sounds different. Cached buffers are read-only
+    because they are shared between callers. Safe to use from several
+    threads.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(patch):
+        return tuple(sorted({**DEFAULT_PATCH, **patch}.items()))
+
+    @staticmethod
+    def is_random(patch):
+        """True if the patch draws noise or dither without a seed, so no two renders are alike."""
+        patch = {**DEFAULT_PATCH, **patch}
+        return patch["noise_seed"] is None and (patch["noise"] or (patch["bit_crush"] and patch["dither"]))
+
+    def get(self, patch):
+        if self.is_random(patch):
+            return None
+        key = self.key(patch)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, patch, result):
+        waveform = result[0]
+        if waveform.nbytes > self.max_bytes or self.is_random(patch):
+            return  # Would evict everything else (or never be reused), not worth caching
+        waveform.setflags(write=False)
+        key = self.key(patch)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[0].nbytes
+            self._entries[key] = result
+            self.current_bytes += waveform.nbytes
+            # Evict least recently used entries until we fit again
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted[0].nbytes
+
+    def get_or_render(self, patch):
+        """Return the cached render of `patch`, rendering and storing it on a miss."""
+        result = self.get(patch)
+        if result is None:
+            result = render_patch(patch)
+            self.put(patch, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
@@ -0,0 +1,126 @@
+"""Pattern rendering: many notes of one patch placed on a timeline.
+
+    sequencer = Sequencer({"waveform": "square", "lowpass": True})
+    sequencer.add_note(0.0, 440, velocity=0.8, duration=0.25)
+    sequencer.add_note(0.5, midi_to_frequency(64), duration=0.25)
+    audio = sequencer.render()
+
+Every note starts at an exact sample, and each note is added into the
+timeline (overlap-add). Notes with the same frequency and length share one
+cached render; velocity is applied as a gain when the note is mixed in, so
+it does not split the cache. `iter_blocks` renders the timeline in
+fixed-size blocks, which keeps memory bounded for long patterns and can be
+handed straight to ExportService.
+"""
+import numpy as np
+
+from audio_utils import render_note
+from effects import BufferPool, EffectsChain
+from instrumentation import timed
+from rendering import DEFAULT_PATCH, WAVEFORMS, RenderCache, patch_oscillator
+
+TIMELINE_BLOCK = 65536  # Frames per timeline block in iter_blocks
+
+
+def midi_to_frequency(pitch):
+    """Frequency in Hz of a MIDI note number (69 = A4 = 440 Hz)."""
+    return 440.0 * 2 ** ((pitch - 69) / 12)
+
+
+class Sequencer:
+    """A list of (time, frequency, velocity, duration) notes rendered with one patch.
+
+    Times and durations are in seconds. A note's gate is held for its
+    duration, then the patch's release runs, so every note rings for
+    duration + release. The patch's attack, decay and sustain level shape
+    the note as in render_note; its hold time is not used.
+    """
+
+    def __init__(self, patch=None, cache_bytes=64 * 1024 * 1024):
+        self.patch = {**DEFAULT_PATCH, **(patch or {})}
+        if self.patch["waveform"] not in WAVEFORMS:
+            raise ValueError(f"Unknown waveform type: {self.patch['waveform']}")
+        self.sample_rate = self.patch["sample_rate"]
+        self.dtype = np.dtype(self.patch["dtype"])
+        self.notes = []
+        self.cache = RenderCache(cache_bytes)
+        self.pool = BufferPool()
+
+    def add_note(self, time, frequency, velocity=1.0, duration=0.25):
+        self.notes.append((time, frequency, velocity, duration))
+
+    def add_notes(self, notes):
+        self.notes.extend(notes)
+
+    def note_frames(self, duration):
+        """Rendered length of a note held for `duration` seconds, release included."""
+        return int(round(duration * self.sample_rate)) + int(self.patch["release"] * self.sample_rate)
+
+    @property
+    def frames(self):
+        """Length of the whole pattern, up to the end of the last release."""
+        return max((self.start_frame(time) + self.note_frames(duration) for time, _, _, duration in self.notes),
+                   default=0)
+
+    def start_frame(self, time):
+        return int(round(time * self.sample_rate))
+
+    def render_note(self, frequency, frames):
+        """Render (or fetch from the cache) one note of the patch at full velocity."""
+        key = {**self.patch, "frequency": frequency, "note_frames": frames}
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+        patch = {**self.patch, "frequency": frequency}
+        waveform = render_note(patch_oscillator(patch, self.dtype), frames, patch["attack"], patch["decay"],
+                               patch["sustain"], patch["release"], self.sample_rate)
+        EffectsChain.from_patch(patch, self.pool).process(waveform)
+        self.cache.put(key, (waveform, self.sample_rate, frames / self.sample_rate))
+        return waveform
+
+    def iter_blocks(self, block_frames=TIMELINE_BLOCK):
+        """Yield the pattern as consecutive blocks of `block_frames` samples (the last may be shorter).
+
+        Only the notes sounding in the current block are touched, and each
+        block buffer is reused, so memory does not grow with the pattern's
+        length. Copy a block if it must outlive the next iteration.
+        """
+        total = self.frames
+        scheduled = sorted((self.start_frame(time), frequency, velocity, self.note_frames(duration))
+                           for time, frequency, velocity, duration in self.notes)
+        buffer = np.empty(block_frames, dtype=self.dtype)
+        scratch = np.empty(block_frames, dtype=self.dtype)
+        sounding = []  # (start frame, velocity, rendered note)
+        next_note = 0
+        for block_start in range(0, total, block_frames):
+            block_stop = min(block_start + block_frames, total)
+            block = buffer[:block_stop - block_start]
+            block.fill(0)
+            while next_note < len(scheduled) and scheduled[next_note][0] < block_stop:
+                start, frequency, velocity, frames = scheduled[next_note]
+                sounding.append((start, velocity, self.render_note(frequency, frames)))
+                next_note += 1
+
+            still_sounding = []
+            for start, velocity, note in sounding:
+                # Overlap of the note with this block, in block and in note coordinates
+                offset = max(start, block_start)
+                stop = min(start + len(note), block_stop)
+                if stop > offset:
+                    segment = scratch[:stop - offset]
+                    np.multiply(note[offset - start:stop - start], velocity, out=segment)
+                    block[offset - block_start:stop - block_start] += segment
+                if start + len(note) > block_stop:
+                    still_sounding.append((start, velocity, note))
+            sounding = still_sounding
+            yield block
+
+    @timed("sequencer render")
+    def render(self, out=None, block_frames=TIMELINE_BLOCK):
+        """Render the whole pattern into one buffer (or into `out`, such as an np.memmap)."""
+        output = np.empty(self.frames, dtype=self.dtype) if out is None else out
+        position = 0
+        for block in self.iter_blocks(block_frames):
+            output[position:position + len(block)] = block
+            position += len(block)
+        return output
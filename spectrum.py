@@ -0,0 +1,137 @@
+"""Incremental short-time Fourier transform for the spectrum view.
+
+`IncrementalSTFT` keeps the magnitudes of every frame it has seen. Feeding
+it a signal that extends the previous one (or streaming blocks with
+`extend`) only transforms the frames that are new. The analysis window is
+cached, and the frame and rfft output buffers are reused between calls.
+"""
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+FFT_SIZE = 2048
+HOP_SIZE = 512
+FLOOR_DB = -120.0
+
+
+@lru_cache(maxsize=8)
+def hann_window(size, dtype=np.float32):
+    window = np.hanning(size).astype(dtype)
+    window.setflags(write=False)  # Shared through the cache
+    return window
+
+
+class IncrementalSTFT:
+    """Magnitude spectrogram in dBFS that grows as samples arrive."""
+
+    def __init__(self, sample_rate=44100, fft_size=FFT_SIZE, hop_size=HOP_SIZE, dtype=np.float32):
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.hop_size = hop_size
+        self.dtype = np.dtype(dtype)
+        self.window = hann_window(fft_size, self.dtype)
+        # A full-scale sine reads 0 dB: its peak bin is amplitude * sum(window) / 2
+        self.scale = 2 / float(np.sum(self.window, dtype=np.float64))
+        self._frame_buffer = np.empty((0, fft_size), dtype=self.dtype)
+        self._spectrum_buffer = np.empty((0, fft_size // 2 + 1), dtype=np.result_type(self.dtype, np.complex64))
+        self.reset()
+
+    def reset(self):
+        self.frame_count = 0
+        self._magnitudes = np.empty((64, self.fft_size // 2 + 1), dtype=self.dtype)
+        self._pending = np.zeros(0, dtype=self.dtype)  # Samples not yet part of a full hop
+        self._signal = None
+
+    @property
+    def frequencies(self):
+        return np.fft.rfftfreq(self.fft_size, 1 / self.sample_rate)
+
+    @property
+    def magnitudes(self):
+        """(frames, bins) array of dBFS values, one row per hop."""
+        return self._magnitudes[:self.frame_count]
+
+    @property
+    def duration(self):
+        """Seconds of signal covered by the analysed frames."""
+        return self.frame_count * self.hop_size / self.sample_rate
+
+    def analyze(self, signal):
+        """Bring the spectrogram up to date with `signal`.
+
+        If `signal` starts with the previously analysed signal, only its new
+        tail is transformed; otherwise the analysis starts over.
+        """
+        previous = self._signal
+        if previous is None or len(signal) < len(previous) or not np.array_equal(signal[:len(previous)], previous):
+            self.reset()
+            previous = signal[:0]
+        self._signal = signal
+        self.extend(signal[len(previous):])
+        return self.magnitudes
+
+    def extend(self, samples):
+        """Analyse the next streamed samples; frames start every hop_size samples."""
+        samples = np.concatenate((self._pending, np.asarray(samples, dtype=self.dtype)))
+        count = max((len(samples) - self.fft_size) // self.hop_size + 1, 0)
+        if count == 0:
+            self._pending = samples
+            return
+        # Keep what the next frames need: everything from the first unused hop on
+        self._pending = samples[count * self.hop_size:]
+
+        frames = sliding_window_view(samples, self.fft_size)[::self.hop_size][:count]
+        frame_buffer = self._buffer("_frame_buffer", count)
+        np.multiply(frames, self.window, out=frame_buffer)
+        spectrum = self._buffer("_spectrum_buffer", count)
+        np.fft.rfft(frame_buffer, axis=1, out=spectrum)
+
+        magnitudes = self._grow(count)
+        np.abs(spectrum, out=magnitudes)
+        magnitudes *= self.scale
+        np.maximum(magnitudes, 10 ** (FLOOR_DB / 20), out=magnitudes)
+        np.log10(magnitudes, out=magnitudes)
+        magnitudes *= 20
+
+    def _buffer(self, name, rows):
+        buffer = getattr(self, name)
+        if len(buffer) < rows:
+            buffer = np.empty((rows, buffer.shape[1]), dtype=buffer.dtype)
+            setattr(self, name, buffer)
+        return buffer[:rows]
+
+    def _grow(self, count):
+        """Rows for `count` new frames, doubling the storage when it runs out."""
+        needed = self.frame_count + count
+        if needed > len(self._magnitudes):
+            grown = np.empty((max(needed, 2 * len(self._magnitudes)), self._magnitudes.shape[1]), dtype=self.dtype)
+            grown[:self.frame_count] = self.magnitudes
+            self._magnitudes = grown
+        rows = self._magnitudes[self.frame_count:needed]
+        self.frame_count = needed
+        return rows
+
+    def display_image(self, columns, rows):
+        """Spectrogram decimated to at most columns x rows, as a (rows, columns) image.
+
+        Neighbouring frames and bins are combined by taking the maximum, so
+        short transients and narrow partials stay visible after the reduction.
+        """
+        if self.frame_count == 0:
+            return np.full((1, 1), FLOOR_DB, dtype=self.dtype)
+        image = max_pool(self.magnitudes, columns)
+        # Transposed copy so the bin reduction also runs over contiguous rows
+        return max_pool(np.ascontiguousarray(image.T), rows)
+
+
+def max_pool(image, limit):
+    """Reduce the rows of `image` to at most `limit` by taking the maximum of equal-sized groups."""
+    factor = -(-len(image) // limit)
+    if factor <= 1:
+        return image
+    full = len(image) // factor * factor
+    pooled = image[:full].reshape(-1, factor, *image.shape[1:]).max(axis=1)
+    if full < len(image):
+        pooled = np.concatenate((pooled, image[full:].max(axis=0, keepdims=True)))
+    return pooled
@@ -0,0 +1,260 @@
+"""Batched parameter sweeps: many variants of one patch rendered as a (variants x frames) array.
+
+    sweep = sweep_grid(frequency=[110, 220, 440], cutoff=[500, 1000, 2000], attack=[0.01, 0.1])
+    waveforms, lengths = render_sweep({"waveform": "sawtooth", "lowpass": True}, sweep)
+
+Each variant's oscillator, envelope and effects are computed for all
+variants at once with broadcasting. Variants of different length (because
+their ADSR times differ) are zero-padded to the longest one; `lengths` holds
+the real frame count of each row. `iter_sweep` renders the rows in chunks
+that fit a memory budget, for sweeps too large to hold in RAM at once.
+"""
+import itertools
+
+import numpy as np
+
+from audio_utils import DEFAULT_DTYPE, NoiseSource, design_lowpass, sosfilt
+from effects import BitCrushStage, BufferPool
+from modulation import vibrato_matrix
+from rendering import DEFAULT_PATCH, WAVEFORMS
+from wavetables import build_mipmap, octave_for, table_lookup
+
+SWEEPABLE = ("frequency", "amplitude", "attack", "decay", "sustain", "hold", "release", "cutoff")
+# Small chunks also run faster: their temporaries stay in cache between passes
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+WORK_BYTES_PER_SAMPLE = 48  # Measured peak working memory per output sample, float64 temporaries included
+
+
+def sweep_grid(**values):
+    """Every combination of the given parameter values, as one flat array per parameter."""
+    names = list(values)
+    combinations = list(itertools.product(*(np.atleast_1d(values[name]) for name in names)))
+    return {name: np.array([combination[i] for combination in combinations]) for i, name in enumerate(names)}
+
+
+def _variant_params(patch, sweep):
+    """Broadcast the swept parameters and fill the rest from the patch, one array per name."""
+    unknown = set(sweep) - set(SWEEPABLE)
+    if unknown:
+        raise ValueError(f"Cannot sweep {sorted(unknown)}, only {SWEEPABLE}")
+    swept = dict(zip(sweep, np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in sweep.values()))))
+    variants = len(next(iter(swept.values()))) if swept else 1
+    return {name: swept.get(name, np.full(variants, float(patch[name]))) for name in SWEEPABLE}
+
+
+def sweep_lengths(patch, sweep):
+    """Frame count of every variant, the same as render_patch would produce."""
+    patch = {**DEFAULT_PATCH, **patch}
+    params = _variant_params(patch, sweep)
+    duration = params["attack"] + params["decay"] + params["hold"] + params["release"]
+    return (patch["sample_rate"] * duration).astype(np.int64)
+
+
+# ===== BATCH GENERATORS =====
+def batch_oscillator(waveform, frequency, amplitude, frames, sample_rate=44100, duty_cycle=0.5, *, pitch=None,
+                     dtype=DEFAULT_DTYPE):
+    """Band-limited oscillators, one row per frequency/amplitude pair, `frames` samples long.
+
+    `pitch` optionally bends every row by a per-sample offset in semitones
+    (broadcast against the rows); the bent frequency is phase-integrated.
+    """
+    dtype = np.dtype(dtype)
+    frequency = np.atleast_1d(np.asarray(frequency, dtype=float))
+    amplitude = np.asarray(amplitude, dtype=dtype).reshape(-1, 1)
+    pulse = waveform == "square" and duty_cycle != 0.5
+    levels = build_mipmap("sawtooth" if pulse else waveform, sample_rate, dtype=dtype)
+    # Absolute phase grows with the note, so it stays float64; table_lookup wraps it
+    if pitch is None:
+        octave = octave_for(frequency)[:, None]
+        phase = np.multiply.outer(frequency / sample_rate, np.arange(frames))
+    else:
+        bend = np.exp2(np.asarray(pitch) / 12)
+        octave = octave_for(frequency * np.max(bend))[:, None]
+        increment = np.multiply.outer(frequency / sample_rate, np.ones(frames)) * bend
+        phase = np.cumsum(increment, axis=1)
+        phase -= increment
+    if pulse:
+        output = table_lookup(levels, octave, phase + (1 - duty_cycle))
+        output -= table_lookup(levels, octave, phase)
+        output += 2 * duty_cycle - 1
+    else:
+        output = table_lookup(levels, octave, phase)
+    output *= amplitude
+    return output
+
+
+def batch_envelope(frames, lengths, attack, decay, sustain, release, sample_rate=44100, dtype=DEFAULT_DTYPE):
+    """ADSR envelopes shaped like render_note's: released so each row's release ends at its length.
+
+    Rows are `frames` long; samples past a row's length are zero.
+    """
+    def column(values, cast=float):
+        return np.asarray(values, dtype=cast).reshape(-1, 1)
+
+    n = np.arange(frames)
+    attack_samples = column(np.asarray(attack) * sample_rate, np.int64)
+    decay_samples = column(np.asarray(decay) * sample_rate, np.int64)
+    release_samples = column(np.asarray(release) * sample_rate, np.int64)
+    sustain = column(sustain)
+    lengths = column(lengths, np.int64)
+    release_start = np.maximum(lengths - release_samples, 0)
+
+    def gated(t):
+        # Segment ramps go from start to stop inclusive, like np.linspace
+        attack_level = t / np.maximum(attack_samples - 1, 1)
+        decay_level = 1 + (sustain - 1) * (t - attack_samples) / np.maximum(decay_samples - 1, 1)
+        return np.where(t < attack_samples, attack_level, np.where(t < attack_samples + decay_samples,
+                                                                   decay_level, sustain))
+
+    release_level = np.where(release_start > 0, gated(release_start - 1), 0.0)
+    released = release_level * (1 - (n - release_start) / np.maximum(release_samples - 1, 1))
+    envelope = np.where(n < release_start, gated(n), np.clip(released, 0, None))
+    envelope[n >= np.minimum(lengths, release_start + release_samples)] = 0
+    return envelope.astype(dtype, copy=False)
+
+
+def _batch_wave(waveform, frequency, amplitude, duration, sample_rate, duty_cycle, dtype):
+    frequency, amplitude, duration = np.broadcast_arrays(np.atleast_1d(frequency), amplitude, duration)
+    lengths = (sample_rate * duration).astype(np.int64)
+    waveforms = batch_oscillator(waveform, frequency, amplitude, lengths.max(), sample_rate, duty_cycle, dtype=dtype)
+    waveforms[np.arange(waveforms.shape[1]) >= lengths[:, None]] = 0
+    return waveforms, sample_rate, duration
+
+
+def batch_sine_wave(frequency, amplitude, sample_rate=44100, attack=0.1, decay=0.1, sustain=0.7, release=0.2,
+                    dtype=DEFAULT_DTYPE):
+    """Batch generate_sine_wave: every argument but sample_rate may be an array, one entry per variant."""
+    frequency, amplitude, attack, decay, sustain, release = np.broadcast_arrays(
+        np.atleast_1d(frequency), amplitude, attack, decay, sustain, release)
+    duration = attack + decay + sustain + release
+    lengths = (sample_rate * duration).astype(np.int64)
+    waveforms = batch_oscillator("sine", frequency, amplitude, lengths.max(), sample_rate, dtype=dtype)
+    waveforms *= batch_envelope(waveforms.shape[1], lengths, attack, decay, sustain, release, sample_rate, dtype)
+    return waveforms, sample_rate, duration
+
+
+def batch_square_wave(frequency, amplitude, duty_cycle=0.5, duration=1.0, sample_rate=44100, dtype=DEFAULT_DTYPE):
+    """Batch generate_square_wave; the duty cycle is shared by all variants."""
+    return _batch_wave("square", frequency, amplitude, duration, sample_rate, duty_cycle, dtype)
+
+
+def batch_sawtooth_wave(frequency, amplitude, duration=1.0, sample_rate=44100, dtype=DEFAULT_DTYPE):
+    """Batch generate_sawtooth_wave."""
+    return _batch_wave("sawtooth", frequency, amplitude, duration, sample_rate, 0.5, dtype)
+
+
+def batch_vibrato(frequency, amplitude, frames, sample_rate=44100, vibrato_rate=5.0, vibrato_depth=0.02,
+                  dtype=DEFAULT_DTYPE):
+    """Batch generate_vibrato (computed in float64 like VibratoOscillator), `frames` samples per row."""
+    frequency = np.asarray(frequency, dtype=float).reshape(-1, 1)
+    amplitude = np.asarray(amplitude, dtype=float).reshape(-1, 1)
+    t = np.arange(frames) / sample_rate
+    increment = frequency * (1 + vibrato_depth * np.sin(2 * np.pi * vibrato_rate * t)) / sample_rate
+    phase = np.cumsum(increment, axis=1)
+    phase -= increment
+    return (amplitude * np.sin(2 * np.pi * phase)).astype(dtype, copy=False)
+
+
+# ===== BATCH EFFECTS =====
+def batch_lowpass_filter(signals, cutoff, sample_rate=44100, order=5, out=None):
+    """Low-pass every row of `signals` with its own cutoff.
+
+    sosfilt runs one filter design per call, so the rows are grouped by
+    cutoff and each group is filtered as one 2D block. A sweep over a few
+    cutoffs therefore costs a few calls, not one per variant.
+    """
+    output = np.empty_like(signals) if out is None else out
+    cutoff = np.broadcast_to(cutoff, len(signals))
+    values, groups = np.unique(cutoff, return_inverse=True)
+    for group, value in enumerate(values):
+        sos = design_lowpass(float(value), sample_rate, order)
+        if len(values) == 1:
+            output[:] = sosfilt(sos, signals, axis=-1)
+        else:
+            rows = np.flatnonzero(groups == group)
+            output[rows] = sosfilt(sos, signals[rows], axis=-1)
+    return output
+
+
+def batch_distortion(signals, gain=5.0, mix=0.5, out=None):
+    """Soft-clipping distortion with a gain and mix per row (scalars or arrays)."""
+    gain = np.asarray(gain, dtype=signals.dtype).reshape(-1, 1)
+    mix = np.asarray(mix, dtype=signals.dtype).reshape(-1, 1)
+    distorted = np.tanh(signals * gain)
+    distorted -= signals
+    distorted *= mix
+    return np.add(signals, distorted, out=out)
+
+
+# ===== SWEEP RENDERING =====
+def _render_rows(patch, params, lengths, frames, rng):
+    sample_rate = patch["sample_rate"]
+    dtype = np.dtype(patch["dtype"])
+    # Vibrato is the same pitch curve for every variant, computed once at control rate
+    pitch = vibrato_matrix(sample_rate).process(frames)["pitch"] if patch["vibrato"] else None
+    signals = batch_oscillator(patch["waveform"], params["frequency"], params["amplitude"], frames, sample_rate,
+                               pitch=pitch, dtype=dtype)
+    signals *= batch_envelope(frames, lengths, params["attack"], params["decay"], params["sustain"],
+                              params["release"], sample_rate, dtype)
+
+    # Same effect order as EffectsChain.from_patch
+    if patch["lowpass"]:
+        batch_lowpass_filter(signals, params["cutoff"], sample_rate, out=signals)
+    if patch["distortion"]:
+        batch_distortion(signals, out=signals)
+    if patch["noise"]:
+        # Every variant draws the same seeded stream (as render_patch does), so it is generated once
+        seed = patch["noise_seed"] if patch["noise_seed"] is not None else rng.integers(2 ** 63)
+        noise = NoiseSource(patch["noise_color"], 1.0, seed, dtype).process(frames)
+        mix = patch["noise_mix"]
+        amplitude = (mix * params["amplitude"]).astype(dtype)[:, None]
+        signals *= 1 - mix
+        signals += noise * amplitude
+    if patch["bit_crush"]:
+        crusher = BitCrushStage(patch["bit_depth"], patch["downsample"], patch["dither"], patch["noise_seed"])
+        if patch["downsample"] == 1 and not patch["dither"]:
+            crusher.process(signals, None)  # Elementwise, so all rows at once
+        else:
+            # Each row gets its own hold and dither stream, as in render_patch
+            pool = BufferPool()
+            for row in signals:
+                crusher.reset()
+                crusher.process(row, pool)
+
+    signals[np.arange(frames) >= lengths[:, None]] = 0  # Effects may ring past the end of a note
+    return signals
+
+
+def iter_sweep(patch, sweep, max_bytes=DEFAULT_CHUNK_BYTES, rng=None):
+    """Render a sweep in chunks of rows, yielding (first_row, waveforms, lengths) per chunk.
+
+    Chunks are sized so their working memory stays under about `max_bytes`;
+    every chunk is padded to the longest variant of the whole sweep.
+    """
+    patch = {**DEFAULT_PATCH, **patch}
+    if patch["waveform"] not in WAVEFORMS:
+        raise ValueError(f"Unknown waveform type: {patch['waveform']}")
+    rng = rng if rng is not None else np.random.default_rng()
+    params = _variant_params(patch, sweep)
+    lengths = sweep_lengths(patch, sweep)
+    frames = int(lengths.max())
+    rows_per_chunk = max(1, int(max_bytes // max(frames * WORK_BYTES_PER_SAMPLE, 1)))
+    for start in range(0, len(lengths), rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        chunk = {name: values[rows] for name, values in params.items()}
+        yield start, _render_rows(patch, chunk, lengths[rows], frames, rng), lengths[rows]
+
+
+def render_sweep(patch, sweep, max_bytes=DEFAULT_CHUNK_BYTES, out=None, rng=None):
+    """Render every variant of `patch` described by `sweep` to ((variants x frames) array, lengths).
+
+    `sweep` maps names from SWEEPABLE to equal-length (or broadcastable)
+    arrays, for example the result of sweep_grid. The output can be written
+    into `out`, such as an np.memmap, so only one chunk is in memory at once.
+    """
+    patch = {**DEFAULT_PATCH, **patch}
+    lengths = sweep_lengths(patch, sweep)
+    output = np.empty((len(lengths), lengths.max()), dtype=patch["dtype"]) if out is None else out
+    for start, waveforms, _ in iter_sweep(patch, sweep, max_bytes, rng):
+        output[start:start + len(waveforms)] = waveforms
+    return output, lengths
@@ -0,0 +1,137 @@
+import numpy as np
+
+from audio_utils import DEFAULT_DTYPE
+from wavetables import build_mipmap, octave_for, table_lookup
+
+
+class VoiceBank:
+    """Polyphonic synth voices rendered together as one (voices x frames) array.
+
+    Every voice has its own frequency, amplitude, phase and ADSR envelope.
+    A block is computed for all active voices at once with NumPy broadcasting
+    and then summed, so there is no Python loop over voices in `process`.
+    """
+
+    def __init__(self, max_voices=16, waveform="sine", sample_rate=44100, dtype=DEFAULT_DTYPE):
+        self.max_voices = max_voices
+        self.dtype = np.dtype(dtype)
+        self.wavetable = build_mipmap(waveform, sample_rate, dtype=self.dtype)
+        self.sample_rate = sample_rate
+
+        # Per-voice state, one slot per voice. Frequency and phase stay float64
+        # because they accumulate; everything that enters the block math uses dtype.
+        self.active = np.zeros(max_voices, dtype=bool)
+        self.note_ids = np.full(max_voices, -1)
+        self.frequency = np.zeros(max_voices)
+        self.phase = np.zeros(max_voices)  # In cycles
+        self.amplitude = np.zeros(max_voices, dtype=self.dtype)
+        self.attack = np.ones(max_voices, dtype=self.dtype)
+        self.decay = np.ones(max_voices, dtype=self.dtype)
+        self.sustain = np.ones(max_voices, dtype=self.dtype)
+        self.release = np.ones(max_voices, dtype=self.dtype)
+        self.elapsed = np.zeros(max_voices, dtype=np.int64)  # Samples since note on
+        self.release_elapsed = np.full(max_voices, -1, dtype=np.int64)  # Samples since note off, -1 while held
+        self.release_level = np.zeros(max_voices, dtype=self.dtype)  # Envelope level when the note was released
+        self.started = np.zeros(max_voices, dtype=np.int64)  # Note-on order, used for stealing
+        self._note_counter = 0
+
+    # ===== VOICE ALLOCATION =====
+    def allocate_voice(self):
+        """Pick a free voice, or steal one if all voices are busy.
+
+        Stealing prefers released voices with the lowest level, then the
+        oldest held voice.
+        """
+        free = np.flatnonzero(~self.active)
+        if len(free):
+            return free[0]
+        released = np.flatnonzero(self.release_elapsed >= 0)
+        if len(released):
+            # Current level of each release ramp, as process computes it
+            progress = self.release_elapsed[released] / self.sample_rate / self.release[released]
+            levels = self.release_level[released] * np.clip(1 - progress, 0, 1)
+            return released[np.argmin(levels)]
+        return np.argmin(self.started)
+
+    def note_on(self, frequency, amplitude=0.5, attack=0.1, decay=0.1, sustain=0.7, release=0.2, note_id=None):
+        """Start a note and return the note id used to release it."""
+        voice = self.allocate_voice()
+        if note_id is None:
+            note_id = self._note_counter
+        self._note_counter += 1
+
+        self.active[voice] = True
+        self.note_ids[voice] = note_id
+        self.frequency[voice] = frequency
+        self.amplitude[voice] = amplitude
+        self.phase[voice] = 0.0
+        # Clamp segment lengths to at least one sample to avoid dividing by zero
+        min_time = 1 / self.sample_rate
+        self.attack[voice] = max(attack, min_time)
+        self.decay[voice] = max(decay, min_time)
+        self.sustain[voice] = sustain
+        self.release[voice] = max(release, min_time)
+        self.elapsed[voice] = 0
+        self.release_elapsed[voice] = -1
+        self.started[voice] = self._note_counter
+        return note_id
+
+    def note_off(self, note_id):
+        """Move every voice playing `note_id` into its release stage."""
+        voices = np.flatnonzero(self.active & (self.note_ids == note_id) & (self.release_elapsed < 0))
+        self.release_level[voices] = self._gated_level(self.elapsed[voices] / self.sample_rate, voices)
+        self.release_elapsed[voices] = 0
+
+    def all_notes_off(self):
+        for note_id in np.unique(self.note_ids[self.active]):
+            self.note_off(note_id)
+
+    @property
+    def active_voices(self):
+        return int(np.count_nonzero(self.active))
+
+    # ===== RENDERING =====
+    def _gated_level(self, t, voices):
+        """Attack/decay/sustain level at time t (seconds since note on) for the given voices."""
+        attack = self.attack[voices]
+        decay = self.decay[voices]
+        sustain = self.sustain[voices]
+        if t.ndim == 2:
+            attack, decay, sustain = attack[:, None], decay[:, None], sustain[:, None]
+        return np.where(t < attack, t / attack,
+                        np.where(t < attack + decay, 1 - (1 - sustain) * (t - attack) / decay, sustain))
+
+    def process(self, frames):
+        """Render the next `frames` samples of all active voices, summed to mono."""
+        voices = np.flatnonzero(self.active)
+        if len(voices) == 0:
+            return np.zeros(frames, dtype=self.dtype)
+
+        offsets = np.arange(frames, dtype=self.dtype)
+        seconds_per_sample = 1 / self.sample_rate
+
+        # Oscillators: (voices x frames) phase matrix, each voice reads its own mipmap level
+        frequency = self.frequency[voices]
+        increment = frequency / self.sample_rate
+        phase = self.phase[voices, None].astype(self.dtype) + increment[:, None].astype(self.dtype) * offsets
+        self.phase[voices] = (self.phase[voices] + increment * frames) % 1.0
+        signal = table_lookup(self.wavetable, octave_for(frequency)[:, None], phase)
+
+        # Envelopes: gated ADSR level, replaced by the release ramp once released
+        t = (self.elapsed[voices, None] / self.sample_rate).astype(self.dtype) + offsets * seconds_per_sample
+        envelope = self._gated_level(t, voices)
+        release_elapsed = self.release_elapsed[voices]
+        released = release_elapsed >= 0
+        if released.any():
+            release_t = (release_elapsed[:, None] / self.sample_rate).astype(self.dtype) + offsets * seconds_per_sample
+            release_env = self.release_level[voices, None] * np.clip(1 - release_t / self.release[voices, None], 0, 1)
+            envelope = np.where(released[:, None], release_env, envelope)
+
+        output = (self.amplitude[voices, None] * envelope * signal).sum(axis=0)
+
+        # Advance the clocks and free voices whose release has finished
+        self.elapsed[voices] += frames
+        self.release_elapsed[voices[released]] += frames
+        finished = voices[released & (self.release_elapsed[voices] / self.sample_rate >= self.release[voices])]
+        self.active[finished] = False
+        return output
@@ -0,0 +1,193 @@
+"""Waveform and spectrogram plot for the main window.
+
+Kept apart from main.py because it pulls in matplotlib, which is slow to
+import: the window imports this module only after it is on screen.
+"""
+import os
+os.environ["QT_API"] = "PyQt6"  # Force Matplotlib to use PyQt6
+
+import matplotlib
+matplotlib.use("QtAgg")  # Ensure it's using the correct Qt backend
+
+import matplotlib.font_manager as fm
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QSizePolicy
+
+from instrumentation import timed
+from spectrum import FLOOR_DB, IncrementalSTFT
+
+MAX_PLOT_FPS = 30  # Renders arriving faster than this are coalesced into the next redraw
+Y_LIMIT_STEP = 0.25  # The waveform's y range grows and shrinks in steps of this size
+
+
+def minmax_envelope(waveform, duration, bins):
+    """Reduce a waveform to a min/max pair per pixel column for plotting.
+
+    Returns (time_axis, values) with two points per bin, so peaks survive
+    the decimation and the plot cost depends on the bin count only.
+    """
+    if len(waveform) <= 2 * bins:
+        return np.linspace(0, duration, len(waveform)), waveform
+    starts = np.linspace(0, len(waveform), bins, endpoint=False).astype(np.intp)
+    values = np.empty(2 * bins)
+    values[0::2] = np.minimum.reduceat(waveform, starts)
+    values[1::2] = np.maximum.reduceat(waveform, starts)
+    time_axis = np.repeat(starts * (duration / len(waveform)), 2)
+    return time_axis, values
+
+
+def amplitude_limit(peak, current=None):
+    """Symmetric y limit for a waveform whose largest magnitude is `peak`.
+
+    The limit is the padded peak rounded up to Y_LIMIT_STEP, and `current`
+    is kept as long as the padded peak fits in it and fills more than half
+    of it. Small parameter changes therefore leave the axes alone, and the
+    plot can blit instead of redrawing the ticks and grid.
+    """
+    needed = 1.05 * peak  # Room so the line does not touch the frame
+    if current is not None and current / 2 < needed <= current:
+        return current
+    return max(float(np.ceil(needed / Y_LIMIT_STEP)) * Y_LIMIT_STEP, Y_LIMIT_STEP)
+
+
+# Matplotlib Canvas for embedding in PyQt
+class WaveformCanvas(FigureCanvas):
+    def __init__(self, parent=None, width=5, height=4, dpi=100, font_path=None):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.axes = self.fig.add_subplot(211)
+        self.spectrum_axes = self.fig.add_subplot(212)
+        super(WaveformCanvas, self).__init__(self.fig)
+        self.setParent(parent)
+        
+        # Make the canvas expandable
+        FigureCanvas.setSizePolicy(self,
+                                  QSizePolicy.Policy.Expanding,
+                                  QSizePolicy.Policy.Expanding)
+        FigureCanvas.updateGeometry(self)
+        
+        # The "Sour Gummy" font file, shared with the Qt widgets
+        self.sour_gummy_font = fm.FontProperties(fname=font_path)
+
+        self.setup_axes()
+
+        # Line, title and spectrogram are animated: they are blitted over a cached background
+        self.background = None
+        self.mpl_connect("draw_event", self.on_draw)
+
+        # Spectrogram of the current render, extended incrementally when the render grows
+        self.stft = None
+
+        # At most MAX_PLOT_FPS redraws per second; only the newest pending render is drawn
+        self._pending_plot = None
+        self._plot_timer = QTimer(self)
+        self._plot_timer.setSingleShot(True)
+        self._plot_timer.setInterval(1000 // MAX_PLOT_FPS)
+        self._plot_timer.timeout.connect(self._flush_plot)
+
+    def setup_axes(self):
+        """Style the figure once; updates only touch the line and the title."""
+         # Clone the font properties and set size dynamically
+        font_title = self.sour_gummy_font.copy()
+        font_title.set_size(16)
+
+        font_labels = self.sour_gummy_font.copy()
+        font_labels.set_size(12)
+        
+         # Change background colors
+        self.fig.patch.set_facecolor("#F7A8C4")  # Outside figure background 
+        self.axes.set_facecolor("#fff0f5")  # Light pink background
+        
+        # Set pink title and labels
+        self.title = self.axes.set_title("Waveform", color="#AC1754", fontsize=14, fontproperties=font_title, animated=True)
+        self.axes.set_xlabel("Time (seconds)", color="#AC1754", fontsize=12, fontproperties=font_labels)
+        self.axes.set_ylabel("Amplitude", color="#AC1754", fontsize=12, fontproperties=font_labels)
+
+        # Spectrogram below the waveform, on the same time axis
+        self.spectrum_axes.set_facecolor("#fff0f5")
+        self.spectrum_axes.set_xlabel("Time (seconds)", color="#AC1754", fontsize=12, fontproperties=font_labels)
+        self.spectrum_axes.set_ylabel("Frequency (Hz)", color="#AC1754", fontsize=12, fontproperties=font_labels)
+
+        # Set tick colors to pink
+        for axes in (self.axes, self.spectrum_axes):
+            axes.tick_params(axis="x", colors="#AC1754")
+            axes.tick_params(axis="y", colors="#AC1754")
+
+        self.axes.grid(True)
+        self.line, = self.axes.plot([], [], color="#E53888", linewidth=2, animated=True)
+        self.spectrogram = self.spectrum_axes.imshow(np.full((1, 1), FLOOR_DB), aspect="auto", origin="lower",
+                                                     cmap="RdPu", vmin=-100, vmax=0, interpolation="nearest",
+                                                     animated=True)
+        self.fig.tight_layout()
+
+    def style_tick_labels(self):
+        # Set font for tick labels
+        for axes in (self.axes, self.spectrum_axes):
+            for label in axes.get_xticklabels() + axes.get_yticklabels():
+                label.set_fontproperties(self.sour_gummy_font)
+
+    def on_draw(self, event):
+        """After a full redraw, cache the static background and draw the animated artists."""
+        self.background = self.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        self.axes.draw_artist(self.line)
+        self.axes.draw_artist(self.title)
+        self.spectrum_axes.draw_artist(self.spectrogram)
+
+    def plot_waveform(self, waveform, sr, duration, title="Waveform"):
+        """Update the plot with new waveform data (at most MAX_PLOT_FPS times a second)."""
+        self._pending_plot = (waveform, sr, duration, title)
+        if not self._plot_timer.isActive():
+            self._flush_plot()
+
+    def _flush_plot(self):
+        if self._pending_plot is None:
+            return
+        self._draw_plot(*self._pending_plot)
+        self._pending_plot = None
+        self._plot_timer.start()
+
+    def update_spectrogram(self, waveform, sr):
+        if self.stft is None or self.stft.sample_rate != sr:
+            self.stft = IncrementalSTFT(sr)
+        self.stft.analyze(waveform)
+        # Decimate to about one cell per pixel of the spectrogram axes
+        bbox = self.spectrum_axes.bbox
+        self.spectrogram.set_data(self.stft.display_image(max(int(bbox.width), 1), max(int(bbox.height), 1)))
+        self.spectrogram.set_extent((0, self.stft.duration, 0, sr / 2))
+
+    @timed("plot")
+    def _draw_plot(self, waveform, sr, duration, title):
+        # One min/max pair per horizontal pixel of the axes
+        bins = max(int(self.axes.bbox.width), 1)
+        time_axis, values = minmax_envelope(waveform, duration, bins)
+        self.line.set_data(time_axis, values)
+        self.title.set_text(title)
+        self.update_spectrogram(waveform, sr)
+
+        # Coarse, sticky y limits, so they (and the full redraw) only change with the level
+        peak = float(np.max(np.abs(values))) if len(values) else 0.0
+        limit = amplitude_limit(peak, None if self.background is None else self.axes.get_ylim()[1])
+        xlim = (0, duration)
+        ylim = (-limit, limit)
+        spectrum_ylim = (0, sr / 2)
+
+        if (self.background is None or xlim != self.axes.get_xlim() or ylim != self.axes.get_ylim()
+                or spectrum_ylim != self.spectrum_axes.get_ylim()):
+            # Limits changed: the ticks and grid need a full redraw
+            self.axes.set_xlim(xlim)
+            self.axes.set_ylim(ylim)
+            self.spectrum_axes.set_xlim(xlim)
+            self.spectrum_axes.set_ylim(spectrum_ylim)
+            self.style_tick_labels()
+            self.draw()
+            return
+
+        # Limits unchanged: restore the cached background and blit the line
+        self.restore_region(self.background)
+        self.draw_animated()
+        self.blit(self.fig.bbox)
@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+import numpy as np
+
+TABLE_SIZE = 2048  # Samples per table, a power of two
+BASE_FREQUENCY = 20.0  # Highest frequency the first mipmap level is built for
+NUM_OCTAVES = 11  # One table per octave, up to 20 Hz * 2**10 = 20480 Hz
+
+WAVETABLE_SHAPES = ("sine", "square", "sawtooth", "triangle")
+
+
+def harmonic_amplitudes(shape, harmonics):
+    """Fourier sine-series amplitudes of harmonics 1..harmonics for a wave shape."""
+    k = np.arange(1, harmonics + 1)
+    if shape == "sine":
+        return (k == 1).astype(float)
+    elif shape == "square":
+        return np.where(k % 2 == 1, 4 / (np.pi * k), 0.0)
+    elif shape == "sawtooth":
+        return -2 / (np.pi * k)
+    elif shape == "triangle":
+        return np.where(k % 2 == 1, 8 / (np.pi * k) ** 2 * (-1.0) ** ((k - 1) // 2), 0.0)
+    else:
+        raise ValueError(f"Unknown wavetable shape: {shape}")
+
+
+@lru_cache(maxsize=None)
+def build_mipmap(shape, sample_rate=44100, table_size=TABLE_SIZE, dtype=np.float64):
+    """Band-limited tables for one shape, one row per octave.
+
+    Row `o` only holds harmonics that stay below Nyquist when played at
+    BASE_FREQUENCY * 2**o, so any note up to that frequency is alias-free.
+    Every entry packs a sample and the slope to the next one (wrapping at
+    the end) as the complex number sample + 1j * slope, so table_lookup
+    gathers both with a single take. Tables are built in float64 and stored
+    in the complex type matching `dtype`.
+    """
+    samples = np.empty((NUM_OCTAVES, table_size))
+    for octave in range(NUM_OCTAVES):
+        top_frequency = BASE_FREQUENCY * 2 ** octave
+        harmonics = int(max(1, min(table_size // 2 - 1, (sample_rate / 2) // top_frequency)))
+        spectrum = np.zeros(table_size // 2 + 1, dtype=complex)
+        spectrum[1:harmonics + 1] = -0.5j * table_size * harmonic_amplitudes(shape, harmonics)
+        samples[octave] = np.fft.irfft(spectrum, table_size)
+    levels = (samples + 1j * (np.roll(samples, -1, axis=1) - samples)).astype(np.result_type(dtype, np.complex64))
+    levels.setflags(write=False)  # Shared through the cache
+    return levels
+
+
+def octave_for(frequency):
+    """Index of the mipmap level to use for a frequency (scalar or array)."""
+    octave = np.ceil(np.log2(np.maximum(frequency, BASE_FREQUENCY) / BASE_FREQUENCY))
+    return np.clip(octave, 0, NUM_OCTAVES - 1).astype(np.intp)
+
+
+def table_lookup(levels, octave, phase):
+    """Linearly interpolated lookup of `phase` (in cycles, >= 0) in the given mipmap level(s).
+
+    `octave` is broadcast against `phase`, so a (voices, 1) octave array and a
+    (voices, frames) phase array look up every voice in its own table. The
+    output has the real dtype of the tables.
+    """
+    size = levels.shape[1]
+    position = phase * size
+    whole = np.floor(position)
+    position -= whole
+    index = whole.astype(np.intp)
+    # Wrap with a bit mask (size is a power of two) and pick the octave's row
+    index &= size - 1
+    if np.ndim(octave):
+        index += octave * size
+        table = levels.ravel()
+    else:
+        table = levels[octave]
+    entries = table.take(index)  # sample + 1j * slope
+    # The fractional position becomes the output, in place unless the phase has another dtype
+    output = position.astype(entries.real.dtype, copy=False)
+    output *= entries.imag
+    output += entries.real
+    return output